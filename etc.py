@@ -1,9 +1,11 @@
-from numpy import unique, array
+from numpy import unique, array, log, asarray, zeros, cumsum, concatenate
+from heapq import heappush, heappop
 from collections import defaultdict
+from multiprocessing import Pool
 from .utilities import *
 
 
-def etc(s, ent_est="MM"):
+def etc(s, ent_est="MM", engine="repair"):
     """
     This is code adapted from the MATLAB script written by Nithin Nagaraj to calculate Effort-To-Compress complexity.
     This method utilizes Non-Sequential Recursive Pair Substitution (NSRPS), described on pg 5 of
@@ -15,6 +17,16 @@ def etc(s, ent_est="MM"):
         s: string, list, or array, required
             should consist of only 1's and 0's
 
+        ent_est: string, optional
+            entropy estimator passed to entropyd ('ML', 'MM' or 'JK')
+
+        engine: string, optional
+            'repair' : pair counts kept in a priority queue over a linked sequence and
+                       entropy updated as each substitution happens, O(n log n); the
+                       entropies agree with 'nsrps' to floating point rounding
+            'nsrps' : the original loop, which rescans the whole sequence with
+                      find_pair and substitute on every iteration, O(n^2)
+
     OUTPUT:
         H : float
              entropy of each step of the algorithm
@@ -25,6 +37,10 @@ def etc(s, ent_est="MM"):
     # convert to an array if a string was input
     if type(s) == str:
         s = array([int(c) for c in s])
+    if engine == "repair":
+        return _etc_repair(s, ent_est)
+    elif engine != "nsrps":
+        raise ValueError("Unknown engine: " + str(engine))
     # The main loop for NSRPS iteration
     N = 0  # The ETC measure 'N'
     H_new = natstobits(entropyd(s, est=ent_est))
@@ -46,6 +62,78 @@ def etc(s, ent_est="MM"):
     return ent_list, N
 
 
+def etc_batch(s, ent_est="MM", workers=1, return_entropies=False):
+    """
+    Effort-To-Compress of every row of a 2-D array. With workers > 1 the rows are
+    spread over a pool of processes, which read the array from shared memory
+    rather than receiving each row pickled.
+
+    INPUT:
+        s: 2-D array, required
+            one sequence per row
+
+        ent_est: string, optional
+            entropy estimator passed to etc
+
+        workers: integer, optional
+            number of processes
+
+        return_entropies: boolean, optional
+            also return the entropy of each step for every row
+
+    OUTPUT:
+        N : array of integers
+             ETC measure of each row
+        H : array of floats, only if return_entropies
+             entropies of all rows one after the other; those of row i are
+             H[offsets[i]:offsets[i + 1]]
+        offsets : array of integers, only if return_entropies
+             start of each row's entropies in H, with len(offsets) = rows + 1
+    """
+    s = asarray(s)
+    if s.ndim != 2:
+        raise ValueError("s must be a 2-D array")
+    rows = s.shape[0]
+    if workers <= 1 or rows <= 1:
+        results = [_etc_row(x, ent_est, return_entropies) for x in s]
+    else:
+        shm, spec = share_array(s)
+        try:
+            with Pool(min(workers, rows), initializer=_etc_attach, initargs=(spec,)) as pool:
+                chunk = max(1, rows // (4 * workers))
+                tasks = [(i, ent_est, return_entropies) for i in range(rows)]
+                results = pool.map(_etc_shared_row, tasks, chunksize=chunk)
+        finally:
+            shm.close()
+            shm.unlink()
+    N = array([r[1] for r in results], dtype="int64")
+    if not return_entropies:
+        return N
+    offsets = zeros(rows + 1, dtype="int64")
+    offsets[1:] = cumsum([len(r[0]) for r in results])
+    H = concatenate([asarray(r[0], dtype=float) for r in results] + [zeros(0)])
+    return N, H, offsets
+
+
+def _etc_row(x, ent_est, return_entropies):
+    ent_list, N = etc(x, ent_est)
+    return (ent_list if return_entropies else []), N
+
+
+_shared = None
+
+
+def _etc_attach(spec):
+    "Pool initializer, attaches the shared input array once per worker"
+    global _shared
+    _shared = attach_array(spec)
+
+
+def _etc_shared_row(task):
+    i, ent_est, return_entropies = task
+    return _etc_row(_shared[1][i], ent_est, return_entropies)
+
+
 def find_pair(s):
     "Finds the most frequent pair of symbols in the sequence"
     L = len(s)
@@ -89,3 +177,269 @@ def substitute(s, freq_pair):
         if indx == L - 1:
             s_new.append(s[indx])
     return s_new
+
+
+def _xlogx(c):
+    return c * log(c) if c > 0 else 0.0
+
+
+def _jackknife_term(c):
+    # c times the change in sum(c log c) when one of c symbols is left out
+    return c * (_xlogx(c) - _xlogx(c - 1)) if c > 1 else 0.0
+
+
+class _PairSequence(object):
+    """
+    A sequence under NSRPS, held as a doubly linked list of nodes so that a pair
+    substitution only touches the neighbourhood of each replaced pair.
+
+    The pair counts are those of find_pair: every adjacent pair (a, b) with
+    a != b counts once, and a run of r equal symbols counts r // 2 times as (a, a).
+    Runs are tracked by their end nodes (rlen and rtail at the first node of a run,
+    rhead at the last), so run lengths change in O(1). Every pair has a heap of
+    the positions where it may occur, checked lazily, and the pairs themselves
+    are kept in a heap ordered by count and then by first occurrence, which is
+    the order in which find_pair breaks ties. Symbol counts and sum(c log c) are
+    updated with every substitution, so the entropy costs O(1) per iteration.
+    """
+
+    def __init__(self, s):
+        codes = {}
+        self.sym = [codes.setdefault(c, len(codes)) for c in s]
+        n = len(self.sym)
+        self.nxt = list(range(1, n + 1))
+        if n:
+            self.nxt[-1] = -1
+        self.prv = list(range(-1, n - 1))
+        self.rlen = [0] * n
+        self.rtail = [0] * n
+        self.rhead = [0] * n
+        self.next_symbol = len(codes)
+
+        self.length = n
+        self.counts = defaultdict(int)
+        for c in self.sym:
+            self.counts[c] += 1
+        self.alphabet = len(self.counts)
+        self.sum_xlogx = sum(_xlogx(c) for c in self.counts.values())
+        self.sum_jackknife = sum(_jackknife_term(c) for c in self.counts.values())
+
+        self.pairs = defaultdict(int)  # pair -> count
+        self.where = defaultdict(list)  # pair -> heap of candidate positions
+        self.heap = []  # (-count, first position, pair)
+        self.top = {}  # pair -> (count, first position) of its live heap entry
+        self.dirty = set()
+
+        runs = []
+        start = 0
+        for i in range(1, n + 1):
+            if i == n or self.sym[i] != self.sym[start]:
+                runs.append(self._make_run(start, i - 1, i - start, self.sym[start]))
+                start = i
+        self._add_runs(runs, 1)
+        self._flush()
+
+    # ---- runs ----
+
+    def _make_run(self, start, end, length, symbol):
+        self.rlen[start] = length
+        self.rtail[start] = end
+        self.rhead[end] = start
+        return (start, end, length, symbol)
+
+    def _run_from_start(self, start):
+        return (start, self.rtail[start], self.rlen[start], self.sym[start])
+
+    def _run_from_end(self, end):
+        return self._run_from_start(self.rhead[end])
+
+    def _add_runs(self, runs, sign):
+        # count contributions of consecutive runs and of the pairs between them
+        for k, (start, end, length, symbol) in enumerate(runs):
+            if length >= 2:
+                self._count((symbol, symbol), start, sign * (length // 2))
+            if k > 0:
+                self._count((runs[k - 1][3], symbol), runs[k - 1][1], sign)
+
+    def _replace_runs(self, old, new):
+        # merge neighbouring runs of the same symbol, then swap the contributions
+        merged = []
+        for run in new:
+            if merged and merged[-1][3] == run[3]:
+                start, _, length, symbol = merged.pop()
+                run = (start, run[1], length + run[2], symbol)
+            merged.append(run)
+        self._add_runs(old, -1)
+        merged = [self._make_run(*run) for run in merged]
+        self._add_runs(merged, 1)
+
+    # ---- counts ----
+
+    def _count(self, pair, pos, delta):
+        if delta == 0:
+            return
+        self.pairs[pair] += delta
+        if delta > 0:
+            heappush(self.where[pair], pos)
+        self.dirty.add(pair)
+
+    def _set_symbol_count(self, symbol, count):
+        old = self.counts[symbol]
+        self.sum_xlogx += _xlogx(count) - _xlogx(old)
+        self.sum_jackknife += _jackknife_term(count) - _jackknife_term(old)
+        self.alphabet += (count > 0) - (old > 0)
+        if count > 0:
+            self.counts[symbol] = count
+        else:
+            del self.counts[symbol]
+
+    def _occurs_at(self, pair, pos):
+        a, b = pair
+        if self.sym[pos] != a:
+            return False
+        if a != b:
+            nxt = self.nxt[pos]
+            return nxt != -1 and self.sym[nxt] == b
+        # (a, a) is recorded at the first node of a run of at least two
+        prv = self.prv[pos]
+        return (prv == -1 or self.sym[prv] != a) and self.rlen[pos] >= 2
+
+    def _flush(self):
+        for pair in self.dirty:
+            count = self.pairs[pair]
+            if count <= 0:
+                del self.pairs[pair]
+                self.where.pop(pair, None)
+                self.top.pop(pair, None)
+                continue
+            where = self.where[pair]
+            while not self._occurs_at(pair, where[0]):
+                heappop(where)
+            key = (count, where[0])
+            if self.top.get(pair) != key:
+                self.top[pair] = key
+                heappush(self.heap, (-count, where[0], pair))
+        self.dirty.clear()
+
+    def most_frequent_pair(self):
+        "Same pair as find_pair"
+        while True:
+            count, first, pair = self.heap[0]
+            if self.top.get(pair) == (-count, first):
+                return pair
+            heappop(self.heap)
+
+    # ---- substitution ----
+
+    def substitute(self, pair):
+        "Replaces every occurrence of pair by a new symbol, as substitute does"
+        a, b = pair
+        new = self.next_symbol
+        self.next_symbol += 1
+        positions = sorted(set(p for p in self.where[pair] if self._occurs_at(pair, p)))
+        replaced = 0
+        for p in positions:
+            if a != b:
+                replaced += self._substitute_at(p, new)
+            else:
+                replaced += self._substitute_run(p, new)
+        if a != b:
+            self._set_symbol_count(a, self.counts[a] - replaced)
+            self._set_symbol_count(b, self.counts[b] - replaced)
+        else:
+            self._set_symbol_count(a, self.counts[a] - 2 * replaced)
+        self._set_symbol_count(new, replaced)
+        self.length -= replaced
+        self._flush()
+
+    def _neighbour_runs(self, first, last):
+        # the runs just before and just after the nodes first..last
+        before = self.prv[first]
+        after = self.nxt[last]
+        left = [self._run_from_end(before)] if before != -1 else []
+        right = [self._run_from_start(after)] if after != -1 else []
+        return left, right
+
+    def _substitute_at(self, p, new):
+        # p ends a run of a's and the next node q starts a run of b's
+        q = self.nxt[p]
+        run_a = self._run_from_end(p)
+        run_b = self._run_from_start(q)
+        left, right = self._neighbour_runs(run_a[0], run_b[1])
+        old = left + [run_a, run_b] + right
+
+        self.sym[p] = new
+        self.sym[q] = None
+        v = self.nxt[q]
+        self.nxt[p] = v
+        if v != -1:
+            self.prv[v] = p
+
+        runs = list(left)
+        if run_a[2] > 1:
+            runs.append((run_a[0], self.prv[p], run_a[2] - 1, run_a[3]))
+        runs.append((p, p, 1, new))
+        if run_b[2] > 1:
+            runs.append((v, run_b[1], run_b[2] - 1, run_b[3]))
+        self._replace_runs(old, runs + right)
+        return 1
+
+    def _substitute_run(self, p, new):
+        # p starts a run of r a's, which becomes r // 2 new symbols (and an a if r is odd)
+        run = self._run_from_start(p)
+        left, right = self._neighbour_runs(run[0], run[1])
+        old = left + [run] + right
+
+        nodes = [p]
+        for _ in range(run[2] - 1):
+            nodes.append(self.nxt[nodes[-1]])
+        half = run[2] // 2
+        kept = nodes[0 : 2 * half : 2]
+        for node in kept:
+            self.sym[node] = new
+        for node in nodes[1 : 2 * half : 2]:
+            self.sym[node] = None
+        if run[2] % 2:
+            kept.append(nodes[-1])
+        for u, v in zip(kept[:-1], kept[1:]):
+            self.nxt[u] = v
+            self.prv[v] = u
+        after = self.nxt[nodes[-1]]
+        self.nxt[kept[-1]] = after
+        if after != -1:
+            self.prv[after] = kept[-1]
+
+        runs = left + [(kept[0], kept[half - 1], half, new)]
+        if run[2] % 2:
+            runs.append((nodes[-1], nodes[-1], 1, run[3]))
+        self._replace_runs(old, runs + right)
+        return half
+
+    def entropy(self, est):
+        "Entropy of the sequence in nats, as entropyd computes it"
+        L = self.length
+        if self.alphabet <= 1:
+            return 0.0
+        H = log(L) - self.sum_xlogx / L
+        if est == "ML":
+            return H
+        elif est == "MM":
+            return H + (self.alphabet - 1.0) / (2.0 * L)
+        elif est == "JK":
+            Sc = L * log(L - 1.0) - (L * self.sum_xlogx - self.sum_jackknife) / (L - 1.0)
+            return L * H - ((L - 1.0) / L) * Sc
+        raise ValueError("Unknown entropy estimator: " + str(est))
+
+
+def _etc_repair(s, ent_est):
+    "ETC by NSRPS over a _PairSequence"
+    seq = _PairSequence(s)
+    N = 0
+    H_new = natstobits(seq.entropy(ent_est))
+    ent_list = [H_new * seq.length]
+    while seq.alphabet > 1:
+        seq.substitute(seq.most_frequent_pair())
+        H_new = natstobits(seq.entropy(ent_est))
+        ent_list.append(H_new * seq.length)
+        N = N + 1
+    return ent_list, N
@@ -1,9 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import pickle
+from multiprocessing import Pool
+from .utilities import share_array, attach_array
 
 
-def hamming(s):
+def hamming(s, engine="fft", workers=1):
     """
     This function calculates the minimum hamming distance between the
     sequences in each pair of rows in an array. By minimum, it is meant that
@@ -11,10 +11,19 @@ def hamming(s):
     pair of sequences. The output is a symmetric matrix of the minimum distances.
 
         INPUT: s, numpy int array of arrays
+               engine, 'fft' (default) counts the matches of every alignment of a
+                       pair at once by circular cross-correlation, O(n log n) per pair
+                       'loop' compares the sequences element by element, O(n^2) per pair
+               workers, number of processes the 'fft' engine spreads tiles of the
+                        matrix over
 
         OUTPUT: hmap, numpy float32 array of arrays
 
     """
+    if engine == "fft":
+        return _hamming_fft(np.asarray(s), workers)
+    elif engine != "loop":
+        raise ValueError("Unknown engine: " + str(engine))
     L = len(s)
     hmap = np.zeros([L, L], dtype=np.float32)
 
@@ -48,3 +57,86 @@ def hamming(s):
             j += 1
 
     return hmap
+
+
+def _hamming_fft(s, workers=1, tile_size=2 ** 18):
+    """
+    Minimum circular hamming distances by FFT. The number of matches between
+    row i and row j rotated by k is the sum over symbols v of the circular
+    cross-correlation of the indicators s[i] == v and s[j] == v, and all n
+    rotations come out of one inverse FFT. With two symbols a single indicator
+    is enough, as mismatches = |x| + |y| - 2 * correlation(x, y).
+
+    The upper triangle is split into square tiles of about tile_size values of
+    input per side, which are spread over a pool of processes that read s from
+    shared memory and write into a shared hmap.
+    """
+    L = len(s)
+    hmap = np.zeros([L, L], dtype=np.float32)
+    if L == 0:
+        return hmap
+    n = s.shape[1]
+    symbols = np.unique(s)
+    if len(symbols) == 1:
+        return hmap
+    rows = max(1, tile_size // n)
+    tiles = [(i0, j0, rows, symbols) for i0 in range(0, L, rows) for j0 in range(i0, L, rows)]
+    if workers <= 1 or len(tiles) == 1:
+        for tile in tiles:
+            _hamming_tile(s, hmap, tile)
+        return hmap
+    shm_s, spec_s = share_array(s)
+    shm_h, spec_h = share_array(hmap)
+    try:
+        with Pool(min(workers, len(tiles)), initializer=_hamming_attach, initargs=(spec_s, spec_h)) as pool:
+            pool.map(_hamming_shared_tile, tiles, chunksize=1)
+        hmap = np.ndarray(hmap.shape, dtype=hmap.dtype, buffer=shm_h.buf).copy()
+    finally:
+        shm_s.close()
+        shm_s.unlink()
+        shm_h.close()
+        shm_h.unlink()
+    return hmap
+
+
+def _hamming_tile(s, hmap, tile):
+    "Fills the tile of hmap with rows i0 .. i0 + rows and columns j0 .. j0 + rows"
+    i0, j0, rows, symbols = tile
+    n = s.shape[1]
+    a, b = s[i0 : i0 + rows], s[j0 : j0 + rows]
+    binary = len(symbols) == 2
+    spectra = []
+    for v in symbols[1:] if binary else symbols:
+        x, y = a == v, b == v
+        spectra.append((np.conj(np.fft.rfft(x, axis=1)), np.fft.rfft(y, axis=1)))
+    if binary:
+        ones_a = (a == symbols[1]).sum(axis=1)
+        ones_b = (b == symbols[1]).sum(axis=1)
+    for i in range(len(a)):
+        # on the diagonal only the upper triangle is needed
+        j = i if i0 == j0 else 0
+        cross = spectra[0][0][i] * spectra[0][1][j:]
+        for A, B in spectra[1:]:
+            cross += A[i] * B[j:]
+        best = np.rint(np.fft.irfft(cross, n, axis=1).max(axis=1))
+        if binary:
+            mismatches = ones_a[i] + ones_b[j:] - 2 * best
+        else:
+            mismatches = n - best
+        hd = mismatches / n
+        hmap[i0 + i, j0 + j : j0 + len(b)] = hd
+        hmap[j0 + j : j0 + len(b), i0 + i] = hd
+
+
+_shared = None
+
+
+def _hamming_attach(spec_s, spec_h):
+    "Pool initializer, attaches the shared input and output once per worker"
+    global _shared
+    _shared = (attach_array(spec_s), attach_array(spec_h))
+
+
+def _hamming_shared_tile(tile):
+    (_, s), (_, hmap) = _shared
+    _hamming_tile(s, hmap, tile)
@@ -1,7 +1,7 @@
 import numpy as np
 
 
-def lz_complexity(s):
+def lz_complexity(s, engine="ks"):
     """
     Lempel-Ziv complexity as described in Kaspar and Schuster, Phys. Rev. A.
     The input iterable (see below) does not have to be binary (2-element), but
@@ -11,7 +11,17 @@ def lz_complexity(s):
         s : string, list, or tuple, required
           sequence to calculate complexity for
 
+        engine : string, optional
+          'ks' : the Kaspar-Schuster scan below, quadratic on long or
+                 low-complexity sequences
+          'suffix' : the same phrase count from the suffix array of s, near-linear
+                     time (see _lz_complexity_suffix)
+
     """
+    if engine == "suffix":
+        return _lz_complexity_suffix(s)
+    elif engine != "ks":
+        raise ValueError("Unknown engine: " + str(engine))
     i = 0  # where we are in the current block
     k = 1  # current block length
     k_max = 1  # maximum length of matching block in history
@@ -91,3 +101,248 @@ def nlz_complexity(s):
     n = len(s)
     p = sum(s) / len(s)
     return lz_complexity(s) / random_lz_complexity(n, p)
+
+
+def _suffix_array(s):
+    """
+    Suffix array of s by prefix doubling, O(n log^2 n) NumPy work. A suffix
+    that is a prefix of another suffix sorts before it.
+
+    OUTPUT:
+        sa : numpy int64 array, start positions of the suffixes in sorted order
+
+        rank : numpy int64 array, inverse of sa
+    """
+    rank = np.unique(np.asarray(s), return_inverse=True)[1].astype(np.int64).ravel()
+    n = len(rank)
+    sa = np.argsort(rank, kind="stable")
+    k = 1
+    while n > 1:
+        # sort by the ranks of the first k and the next k elements
+        second = np.full(n, -1, dtype=np.int64)
+        second[: max(n - k, 0)] = rank[k:]
+        sa = np.lexsort((second, rank))
+        first, second = rank[sa], second[sa]
+        new = np.empty(n, dtype=np.int64)
+        new[0] = 0
+        new[1:] = (first[1:] != first[:-1]) | (second[1:] != second[:-1])
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = np.cumsum(new)
+        if rank[sa[-1]] == n - 1:
+            break
+        k *= 2
+    return sa.astype(np.int64), rank
+
+
+def _lcp_array(s, sa, rank):
+    """
+    Kasai's algorithm: lcp[r] is the length of the longest common prefix of the
+    suffixes with ranks r-1 and r (lcp[0] = 0).
+    """
+    s = list(s)
+    n = len(s)
+    sa = sa.tolist()
+    lcp = [0] * n
+    h = 0
+    for i, r in enumerate(rank.tolist()):
+        if r == 0:
+            h = 0
+            continue
+        j = sa[r - 1]
+        while i + h < n and j + h < n and s[i + h] == s[j + h]:
+            h += 1
+        lcp[r] = h
+        if h > 0:
+            h -= 1
+    return lcp
+
+
+def _lz_sweep(s, starts, window):
+    """
+    Kaspar-Schuster LZC of the windows s[t:t+window] for every t in starts, all
+    parsed in one left-to-right sweep over s. For a phrase starting at l, the
+    scan over the window history is equivalent to the longest match of s[l:]
+    starting anywhere in [t, l). That match is found from the suffix array of the
+    whole of s: it is with the nearest suffix in rank order whose start lies in
+    [t, l). The start positions already passed by the sweep are kept in a
+    max-tree over ranks, and a min-tree over the lcp array gives the match
+    length, so every phrase of every window costs O(log n).
+    """
+    n = len(s)
+    sa, rank = _suffix_array(s)
+    lcp = _lcp_array(s, sa, rank)
+    rank = rank.tolist()
+
+    # min-tree over the lcp array (any length)
+    mintree = [0] * n + lcp
+
+    def lcp_min(lo, hi):
+        # min of lcp[lo:hi]
+        res = n
+        lo += n
+        hi += n
+        while lo < hi:
+            if lo & 1:
+                res = min(res, mintree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                res = min(res, mintree[hi])
+            lo >>= 1
+            hi >>= 1
+        return res
+
+    for i in range(n - 1, 0, -1):
+        mintree[i] = min(mintree[2 * i], mintree[2 * i + 1])
+
+    # max-tree over ranks holding the start position of every suffix passed so far
+    size = 1
+    while size < n:
+        size *= 2
+    postree = [-1] * (2 * size)
+
+    def prev_from(r, t):
+        # largest rank < r whose suffix starts at or after t, or -1
+        v = r + size
+        while v > 1:
+            if v & 1 and postree[v - 1] >= t:
+                v -= 1
+                while v < size:
+                    v = 2 * v + 1
+                    if postree[v] < t:
+                        v -= 1
+                return v - size
+            v >>= 1
+        return -1
+
+    def next_from(r, t):
+        # smallest rank > r whose suffix starts at or after t, or -1
+        v = r + size
+        while v > 1:
+            if not v & 1 and postree[v + 1] >= t:
+                v += 1
+                while v < size:
+                    v = 2 * v
+                    if postree[v] < t:
+                        v += 1
+                return v - size
+            v >>= 1
+        return -1
+
+    lzc = np.ones(len(starts), dtype=np.int64)
+    waiting = {}  # phrase start -> windows whose next phrase starts there
+    for w, t in enumerate(starts):
+        waiting.setdefault(t + 1, []).append(w)
+
+    for l in range(1, n):
+        # positions l-1 and below are now history; positions only grow, so
+        # every node on the path gets the new maximum
+        v = rank[l - 1] + size
+        while v >= 1:
+            postree[v] = l - 1
+            v >>= 1
+        for w in waiting.pop(l, []):
+            t = starts[w]
+            end = t + window
+            r = rank[l]
+            k_max = 0  # longest match of s[l:] starting in [t, l)
+            p = prev_from(r, t)
+            if p >= 0:
+                k_max = lcp_min(p + 1, r + 1)
+            p = next_from(r, t)
+            if p >= 0:
+                k_max = max(k_max, lcp_min(r + 1, p + 1))
+            lzc[w] += 1
+            # the scan stops at the end of the window, as in lz_complexity
+            if k_max >= max(end - 3 - l, 1):
+                continue
+            l_next = l + k_max + 1
+            if l_next < end - 1:
+                waiting.setdefault(l_next, []).append(w)
+    return lzc
+
+
+def _lz_complexity_suffix(s):
+    """
+    Kaspar-Schuster LZC from the suffix array of s. The scan over the history
+    for a phrase starting at l finds the longest previous factor of l: the
+    longest match of s[l:] starting anywhere before l. That match is with the
+    nearest suffix in rank order on either side that starts before l, so one
+    pass over the suffix array in each direction with a stack of candidates
+    gives it for every l (Crochemore and Ilie), O(n) after the suffix array.
+    """
+    if isinstance(s, str):
+        s = list(s)
+    n = len(s)
+    if n < 2:
+        raise ValueError("Sequence must have at least 2 elements")
+    sa, rank = _suffix_array(s)
+    lcp = _lcp_array(s, sa, rank)
+    sa = sa.tolist()
+
+    # nearest smaller start position on either side in rank order; heights[j]
+    # is the lcp between the suffixes at stack[j] and stack[j+1] (or the current one)
+    lpf = [0] * n
+    for ranks, gap in [(range(n), lambda r: lcp[r]),
+                       (range(n - 1, -1, -1), lambda r: lcp[r + 1] if r + 1 < n else 0)]:
+        stack = []
+        heights = []
+        for r in ranks:
+            h = gap(r)
+            while stack and sa[stack[-1]] > sa[r]:
+                stack.pop()
+                heights.pop()
+                if heights:
+                    h = min(h, heights[-1])
+            if stack:
+                lpf[sa[r]] = max(lpf[sa[r]], h)
+                heights[-1] = h
+            stack.append(r)
+            heights.append(0)
+
+    # the phrases of the Kaspar-Schuster parse, including its stopping rule
+    lzc = 1
+    l = 1
+    while True:
+        lzc += 1
+        if lpf[l] >= max(n - 3 - l, 1):
+            break
+        l += lpf[l] + 1
+        if l + 1 > n - 1:
+            break
+    return lzc
+
+
+def lz_complexity_windowed(s, window, step=1):
+    """
+    Lempel-Ziv complexity (as computed by lz_complexity) of every window
+    s[t:t+window], t = 0, step, 2*step, ...  The suffix array and lcp array of s
+    are built once and shared by all of the windows, so the cost is
+    O(n log^2 n) for the suffix array plus O(log n) per LZ phrase, instead of
+    rescanning each window's history; stride-1 series of long recordings are
+    practical. Use complexity.lzc.lzc.lz_complexity_windowed for speed.
+
+    INPUT:
+        s : string, list, tuple or array, required
+          sequence to calculate the complexity series for
+
+        window : int, required
+          window length, at least 2
+
+        step : int, optional
+          distance between the starts of consecutive windows
+
+    OUTPUT:
+        lzc : numpy int64 array, complexity of each window
+    """
+    if window < 2:
+        raise ValueError("window must be at least 2")
+    if step < 1:
+        raise ValueError("step must be at least 1")
+    if isinstance(s, str):
+        s = list(s)
+    n = len(s)
+    if n < window:
+        return np.zeros(0, dtype=np.int64)
+    starts = list(range(0, n - window + 1, step))
+    return _lz_sweep(s, starts, window)
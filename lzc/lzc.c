@@ -1,119 +1,479 @@
 /*
-This function will calculate the lzc of a sequence
+These functions calculate the lzc of sequences
     INPUT:
-      *s: int array
-      N: int, length of int array
+      *s: array of uint8, int32 or int64 elements (see lzc_kernels.h)
+      N: int64, length of the array
 */
+#include <stdlib.h>
+#include <string.h>
 #include "lzc.h"
+#include "lzc_parallel.h"
+
+/*
+Suffix array, lcp array and the shared sweep behind the windowed LZC. The
+typed entry points copy their input into an int64 buffer and call lz_sweep.
+*/
 
+typedef struct
+{
+  int64_t value;
+  int64_t index;
+} lzc_keyed;
 
-LZCEXPORT int lz_complexity(int *s, int N)
+static int lzc_cmp_keyed(const void *pa, const void *pb)
+{
+  const lzc_keyed *a = (const lzc_keyed *)pa, *b = (const lzc_keyed *)pb;
+  if (a->value != b->value)
+    return a->value < b->value ? -1 : 1;
+  return a->index < b->index ? -1 : (a->index > b->index);
+}
+
+/*
+Replaces the elements of x by their dense ranks 0..K-1 and returns K, or -1 if
+memory runs out
+*/
+static int64_t lzc_dense_ranks(int64_t *x, int64_t n)
 {
-  int i = 0, k = 1, l = 1;
-  int k_max = 1;
-  int n = N-1;
-  int lzc = 1;
+  int64_t i, K = 0;
+  lzc_keyed *keyed = (lzc_keyed *)malloc(n*sizeof(lzc_keyed));
 
-  while(1)
+  if (keyed == NULL)
+    return -1;
+  for (i = 0; i < n; i++)
   {
-    if (s[i+k-1] == s[l+k-1])
+    keyed[i].value = x[i];
+    keyed[i].index = i;
+  }
+  qsort(keyed, n, sizeof(lzc_keyed), lzc_cmp_keyed);
+  for (i = 0; i < n; i++)
+  {
+    if (i > 0 && keyed[i].value != keyed[i-1].value)
+      K++;
+    x[keyed[i].index] = K;
+  }
+  free(keyed);
+  return K+1;
+}
+
+/*
+Suffix array by prefix doubling with counting sorts, O(n log n). x holds dense
+ranks 0..K-1. On return sa holds the suffix array and rk its inverse. A suffix
+that is a prefix of another suffix sorts before it. Returns 0, or -1 if memory
+runs out.
+*/
+static int lzc_suffix_array(const int64_t *x, int64_t n, int64_t K, int64_t *sa, int64_t *rank)
+{
+  int64_t i, k, p, c, a, b, ra, rb;
+  int64_t *rk = rank, *tmp, *cnt, *swap;
+  int64_t ncnt = (K > n ? K : n) + 1;
+
+  tmp = (int64_t *)malloc(n*sizeof(int64_t));
+  cnt = (int64_t *)malloc(ncnt*sizeof(int64_t));
+  if (tmp == NULL || cnt == NULL)
+  {
+    free(tmp);
+    free(cnt);
+    return -1;
+  }
+  // counting sort by the first element
+  for (i = 0; i < ncnt; i++)
+    cnt[i] = 0;
+  for (i = 0; i < n; i++)
+  {
+    rk[i] = x[i];
+    cnt[x[i]+1]++;
+  }
+  for (i = 1; i < ncnt; i++)
+    cnt[i] += cnt[i-1];
+  for (i = 0; i < n; i++)
+    sa[cnt[x[i]]++] = i;
+
+  for (k = 1; K < n; k <<= 1)
+  {
+    // order by the rank of the next k elements: suffixes shorter than k+1 first
+    p = 0;
+    for (i = n-k; i < n; i++)
+      tmp[p++] = i;
+    for (i = 0; i < n; i++)
+      if (sa[i] >= k)
+        tmp[p++] = sa[i]-k;
+    // then a stable counting sort by the rank of the first k elements
+    for (i = 0; i < K; i++)
+      cnt[i] = 0;
+    for (i = 0; i < n; i++)
+      cnt[rk[i]]++;
+    for (c = 0, i = 0; i < K; i++)
     {
-      k += 1;
-      if (l+k >= n-1)
-      {
-        lzc += 1;
-        break;
-      }
+      p = cnt[i];
+      cnt[i] = c;
+      c += p;
     }
-    else
+    for (i = 0; i < n; i++)
+      sa[cnt[rk[tmp[i]]]++] = tmp[i];
+    // rank by the first 2k elements
+    tmp[sa[0]] = 0;
+    K = 1;
+    for (i = 1; i < n; i++)
     {
-      if (k > k_max)
-      {
-        k_max = k;
-      }
-      i += 1;
-      if (i == l)
-      {
-        lzc += 1;
-        l += k_max;
-        if (l+1 > n)
-        {
-          break;
-        }
-        else
-        {
-          i = 0;
-          k = 1;
-          k_max = 1;
-        }
-      }
-      else
-      {
-        k = 1;
-      }
+      a = sa[i-1];
+      b = sa[i];
+      ra = a+k < n ? rk[a+k] : -1;
+      rb = b+k < n ? rk[b+k] : -1;
+      tmp[b] = (rk[a] == rk[b] && ra == rb) ? K-1 : K++;
     }
+    swap = rk;
+    rk = tmp;
+    tmp = swap;
   }
-  return lzc;
+  // the final ranks may be in the scratch buffer
+  if (rk != rank)
+  {
+    memcpy(rank, rk, n*sizeof(int64_t));
+    tmp = rk;
+  }
+  free(cnt);
+  free(tmp);
+  return 0;
 }
 
 /*
-This function will calculate the lzc of a sequence but stop iteration if a threshold is reached
-    INPUT:
-      *s: int array
-      N: int, length of int array
+Kasai's algorithm: writes lcp[r], the longest common prefix of the suffixes with
+ranks r-1 and r (lcp[0] = 0)
 */
+static void lzc_lcp_array(const int64_t *x, int64_t n, const int64_t *sa, const int64_t *rk, int64_t *lcp)
+{
+  int64_t i, j, h = 0;
 
-LZCEXPORT int lz_complexity2(int *s, int N, int threshold)
+  for (i = 0; i < n; i++)
+  {
+    if (rk[i] == 0)
+    {
+      lcp[0] = 0;
+      h = 0;
+      continue;
+    }
+    j = sa[rk[i]-1];
+    while (i+h < n && j+h < n && x[i+h] == x[j+h])
+      h++;
+    lcp[rk[i]] = h;
+    if (h > 0)
+      h--;
+  }
+}
+
+// min of lcp[lo:hi], from a bottom-up min-tree with the lcp array in tree[n:2n]
+static int64_t lzc_lcp_min(const int64_t *tree, int64_t n, int64_t lo, int64_t hi)
 {
-  int i = 0, k = 1, l = 1;
-  int k_max = 1;
-  int n = N-1;
-  int lzc = 1;
+  int64_t res = n;
 
-  while(1)
+  for (lo += n, hi += n; lo < hi; lo >>= 1, hi >>= 1)
   {
-    if (s[i+k-1] == s[l+k-1])
+    if (lo & 1)
+    {
+      if (tree[lo] < res)
+        res = tree[lo];
+      lo++;
+    }
+    if (hi & 1)
     {
-      k += 1;
-      if (l+k >= n-1)
+      hi--;
+      if (tree[hi] < res)
+        res = tree[hi];
+    }
+  }
+  return res;
+}
+
+// largest leaf index < r of a max-tree whose value is >= t, or -1
+static int64_t lzc_prev_from(const int64_t *tree, int64_t size, int64_t r, int64_t t)
+{
+  int64_t v = r+size;
+
+  while (v > 1)
+  {
+    if ((v & 1) && tree[v-1] >= t)
+    {
+      v--;
+      while (v < size)
       {
-        lzc += 1;
-        break;
+        v = 2*v+1;
+        if (tree[v] < t)
+          v--;
       }
+      return v-size;
     }
-    else
+    v >>= 1;
+  }
+  return -1;
+}
+
+// smallest leaf index > r of a max-tree whose value is >= t, or -1
+static int64_t lzc_next_from(const int64_t *tree, int64_t size, int64_t r, int64_t t)
+{
+  int64_t v = r+size;
+
+  while (v > 1)
+  {
+    if (!(v & 1) && tree[v+1] >= t)
     {
-      if (k > k_max)
+      v++;
+      while (v < size)
       {
-        k_max = k;
+        v = 2*v;
+        if (tree[v] < t)
+          v++;
       }
-      i += 1;
-      if (i == l)
+      return v-size;
+    }
+    v >>= 1;
+  }
+  return -1;
+}
+
+/*
+This function will calculate the lzc of the windows x[t:t+window] for
+t = 0, step, 2*step, ... in one left-to-right sweep over x
+    INPUT:
+      *x: int64 array, overwritten
+      n: length of x
+      window: window length, at least 2 and at most n
+      step: distance between window starts
+      *out: int64 array, receives the lzc of each window
+For a phrase starting at l, the Kaspar-Schuster scan over the window history
+finds the longest match of x[l:] starting anywhere in [t, l). That is the match
+with the nearest suffix in rank order whose start lies in [t, l), so it is found
+from the suffix array of the whole of x: the start positions already passed by
+the sweep are kept in a max-tree over ranks, and a min-tree over the lcp array
+gives the match length. Every phrase of every window costs O(log n).
+Returns 0, or -1 if memory runs out.
+*/
+static int lz_sweep(int64_t *x, int64_t n, int64_t window, int64_t step, int64_t *out)
+{
+  int64_t nwin = (n-window)/step + 1;
+  int64_t size = 1;
+  int64_t K, i, l, w, nw, t, end, r, p, m, k_max, cap, l_next;
+  int64_t *sa = NULL, *rk = NULL, *lcptree = NULL, *postree = NULL, *head = NULL, *link = NULL;
+  int status = -1;
+
+  while (size < n)
+    size <<= 1;
+  K = lzc_dense_ranks(x, n);
+  sa = (int64_t *)malloc(n*sizeof(int64_t));
+  rk = (int64_t *)malloc(n*sizeof(int64_t));
+  lcptree = (int64_t *)malloc(2*n*sizeof(int64_t));
+  if (K < 0 || sa == NULL || rk == NULL || lcptree == NULL)
+    goto done;
+  if (lzc_suffix_array(x, n, K, sa, rk) != 0)
+    goto done;
+  lzc_lcp_array(x, n, sa, rk, lcptree+n);
+  for (i = n-1; i > 0; i--)
+    lcptree[i] = lcptree[2*i] < lcptree[2*i+1] ? lcptree[2*i] : lcptree[2*i+1];
+  free(sa);
+  sa = NULL;
+
+  postree = (int64_t *)malloc(2*size*sizeof(int64_t));
+  head = (int64_t *)malloc(n*sizeof(int64_t));
+  link = (int64_t *)malloc(nwin*sizeof(int64_t));
+  if (postree == NULL || head == NULL || link == NULL)
+    goto done;
+  for (i = 0; i < 2*size; i++)
+    postree[i] = -1;
+  for (i = 0; i < n; i++)
+    head[i] = -1;
+  // every window starts with one phrase; the next one starts at t+1
+  for (w = 0; w < nwin; w++)
+  {
+    out[w] = 1;
+    link[w] = head[w*step+1];
+    head[w*step+1] = w;
+  }
+
+  for (l = 1; l < n; l++)
+  {
+    // position l-1 is now history; positions only grow, so every node on the
+    // path gets the new maximum
+    for (i = rk[l-1]+size; i >= 1; i >>= 1)
+      postree[i] = l-1;
+    for (w = head[l]; w != -1; w = nw)
+    {
+      nw = link[w];
+      t = w*step;
+      end = t+window;
+      r = rk[l];
+      // longest match of x[l:] starting in [t, l)
+      k_max = 0;
+      p = lzc_prev_from(postree, size, r, t);
+      if (p >= 0)
+        k_max = lzc_lcp_min(lcptree, n, p+1, r+1);
+      p = lzc_next_from(postree, size, r, t);
+      if (p >= 0)
       {
-        lzc += 1;
-		if (lzc > threshold)
-			break;
-        l += k_max;
-        if (l+1 > n)
-        {
-          break;
-        }
-        else
-        {
-          i = 0;
-          k = 1;
-          k_max = 1;
-        }
+        m = lzc_lcp_min(lcptree, n, r+1, p+1);
+        if (m > k_max)
+          k_max = m;
       }
-      else
+      out[w] += 1;
+      // the scan stops at the end of the window, as in lz_complexity
+      cap = end-3-l;
+      if (cap < 1)
+        cap = 1;
+      if (k_max >= cap)
+        continue;
+      l_next = l+k_max+1;
+      if (l_next < end-1)
       {
-        k = 1;
+        link[w] = head[l_next];
+        head[l_next] = w;
       }
     }
   }
+  status = 0;
+
+done:
+  free(sa);
+  free(rk);
+  free(lcptree);
+  free(postree);
+  free(head);
+  free(link);
+  return status;
+}
+
+/*
+This function will calculate the lzc of x from its suffix array, giving the
+same value as the Kaspar-Schuster scan in O(n log n) time
+    INPUT:
+      *x: int64 array, at least 2 elements, overwritten
+      n: length of x
+A phrase starting at l extends the longest previous factor of l, the longest
+match of x[l:] starting anywhere before l. That match is with the nearest suffix
+in rank order on either side that starts before l, so one pass over the suffix
+array in each direction with a stack of candidates gives it for every l
+(Crochemore and Ilie). Returns the lzc, or -1 if memory runs out.
+*/
+static int64_t lz_suffix(int64_t *x, int64_t n)
+{
+  int64_t K, r, h, top, l, lzc, cap;
+  int64_t *sa = NULL, *rk = NULL, *lcp = NULL, *st_rank = NULL, *st_h = NULL;
+  int64_t *lpf;
+
+  K = lzc_dense_ranks(x, n);
+  sa = (int64_t *)malloc(n*sizeof(int64_t));
+  rk = (int64_t *)malloc(n*sizeof(int64_t));
+  lcp = (int64_t *)malloc(n*sizeof(int64_t));
+  if (K < 0 || sa == NULL || rk == NULL || lcp == NULL || lzc_suffix_array(x, n, K, sa, rk) != 0)
+  {
+    lzc = -1;
+    goto done;
+  }
+  lzc_lcp_array(x, n, sa, rk, lcp);
+  // the ranks are no longer needed; x is reused for the stack heights
+  lpf = rk;
+  st_h = x;
+  st_rank = (int64_t *)malloc(n*sizeof(int64_t));
+  if (st_rank == NULL)
+  {
+    lzc = -1;
+    goto done;
+  }
+
+  // nearest smaller start position on the left in rank order; st_h[j] is the
+  // lcp between the suffixes at st_rank[j] and st_rank[j+1] (or the current one)
+  top = -1;
+  for (r = 0; r < n; r++)
+  {
+    h = lcp[r];
+    while (top >= 0 && sa[st_rank[top]] > sa[r])
+    {
+      top--;
+      if (top >= 0 && st_h[top] < h)
+        h = st_h[top];
+    }
+    lpf[sa[r]] = top >= 0 ? h : 0;
+    if (top >= 0)
+      st_h[top] = h;
+    st_rank[++top] = r;
+  }
+  // and on the right
+  top = -1;
+  for (r = n-1; r >= 0; r--)
+  {
+    h = r+1 < n ? lcp[r+1] : 0;
+    while (top >= 0 && sa[st_rank[top]] > sa[r])
+    {
+      top--;
+      if (top >= 0 && st_h[top] < h)
+        h = st_h[top];
+    }
+    if (top >= 0)
+    {
+      if (h > lpf[sa[r]])
+        lpf[sa[r]] = h;
+      st_h[top] = h;
+    }
+    st_rank[++top] = r;
+  }
+
+  // the phrases of the Kaspar-Schuster parse, including its stopping rule
+  lzc = 1;
+  l = 1;
+  while (1)
+  {
+    lzc += 1;
+    cap = n-3-l;
+    if (cap < 1)
+      cap = 1;
+    if (lpf[l] >= cap)
+      break;
+    l += lpf[l]+1;
+    if (l+1 > n-1)
+      break;
+  }
+
+done:
+  free(sa);
+  free(rk);
+  free(lcp);
+  free(st_rank);
   return lzc;
 }
 
+// One set of kernels per element width
+#define LZC_T uint8_t
+#define LZC_SFX u8
+#include "lzc_kernels.h"
+#undef LZC_T
+#undef LZC_SFX
+
+#define LZC_T int32_t
+#define LZC_SFX i32
+#include "lzc_kernels.h"
+#undef LZC_T
+#undef LZC_SFX
+
+#define LZC_T int64_t
+#define LZC_SFX i64
+#include "lzc_kernels.h"
+#undef LZC_T
+#undef LZC_SFX
+
+/*
+The original int entry points, kept for callers of the shared library
+    INPUT:
+      *s: int array
+      N: int, length of int array
+*/
+
+LZCEXPORT int lz_complexity(int *s, int N)
+{
+  return (int)lz_complexity_i32(s, N);
+}
+
+LZCEXPORT int lz_complexity2(int *s, int N, int threshold)
+{
+  return (int)lz_complexity2_i32(s, N, threshold);
+}
+
 // Dummy definition to satisfy Microsoft compiler when using the Python extension mechanism to build.
 void PyInit_lzc(void)
 {
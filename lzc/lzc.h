@@ -2,6 +2,7 @@
 #define LZC_H_INCLUDED 1
 
 #include <stdio.h>
+#include <stdint.h>
 
 #if defined(_MSC_VER)
 #define LZCEXPORT __declspec(dllexport) 
@@ -9,7 +10,41 @@
 #define LZCEXPORT
 #endif
 
+// Used to paste the element type suffix onto the kernel names
+#define LZC_CAT2(a, b) a##_##b
+#define LZC_CAT(a, b) LZC_CAT2(a, b)
+
+#define LZC_NO_THRESHOLD INT64_MAX
+
 LZCEXPORT int lz_complexity(int *s, int N);
 LZCEXPORT int lz_complexity2(int* s, int N, int threshold);
 
-#endif
\ No newline at end of file
+LZCEXPORT int64_t lz_complexity_u8(const uint8_t *s, int64_t N);
+LZCEXPORT int64_t lz_complexity_i32(const int32_t *s, int64_t N);
+LZCEXPORT int64_t lz_complexity_i64(const int64_t *s, int64_t N);
+
+LZCEXPORT int64_t lz_complexity_suffix_u8(const uint8_t *s, int64_t N);
+LZCEXPORT int64_t lz_complexity_suffix_i32(const int32_t *s, int64_t N);
+LZCEXPORT int64_t lz_complexity_suffix_i64(const int64_t *s, int64_t N);
+
+LZCEXPORT int64_t lz_complexity2_u8(const uint8_t *s, int64_t N, int64_t threshold);
+LZCEXPORT int64_t lz_complexity2_i32(const int32_t *s, int64_t N, int64_t threshold);
+LZCEXPORT int64_t lz_complexity2_i64(const int64_t *s, int64_t N, int64_t threshold);
+
+LZCEXPORT void lz_complexity_batch_u8(const uint8_t *s, int64_t rows, int64_t N, int64_t *out, int nthreads);
+LZCEXPORT void lz_complexity_batch_i32(const int32_t *s, int64_t rows, int64_t N, int64_t *out, int nthreads);
+LZCEXPORT void lz_complexity_batch_i64(const int64_t *s, int64_t rows, int64_t N, int64_t *out, int nthreads);
+
+LZCEXPORT int lz_complexity_pairs_u8(const uint8_t *s, int64_t rows, int64_t N, int64_t *out, int nthreads);
+LZCEXPORT int lz_complexity_pairs_i32(const int32_t *s, int64_t rows, int64_t N, int64_t *out, int nthreads);
+LZCEXPORT int lz_complexity_pairs_i64(const int64_t *s, int64_t rows, int64_t N, int64_t *out, int nthreads);
+
+LZCEXPORT int lz_complexity_windowed_u8(const uint8_t *s, int64_t N, int64_t window, int64_t step, int64_t *out);
+LZCEXPORT int lz_complexity_windowed_i32(const int32_t *s, int64_t N, int64_t window, int64_t step, int64_t *out);
+LZCEXPORT int lz_complexity_windowed_i64(const int64_t *s, int64_t N, int64_t window, int64_t step, int64_t *out);
+
+LZCEXPORT int64_t lz_resume_u8(const uint8_t *a, int64_t Na, const uint8_t *b, int64_t Nb, int64_t *state, int open, int64_t *bounds);
+LZCEXPORT int64_t lz_resume_i32(const int32_t *a, int64_t Na, const int32_t *b, int64_t Nb, int64_t *state, int open, int64_t *bounds);
+LZCEXPORT int64_t lz_resume_i64(const int64_t *a, int64_t Na, const int64_t *b, int64_t Nb, int64_t *state, int open, int64_t *bounds);
+
+#endif
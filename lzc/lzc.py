@@ -1,6 +1,8 @@
 import ctypes, os, platform, sys
 from numpy.ctypeslib import ndpointer
-from numpy import array
+from numpy import array, asarray, ascontiguousarray, concatenate, empty, frombuffer
+from numpy import ndarray, zeros
+from numpy import uint8, int32, int64
 
 pyvernum = str(sys.version_info[0]) + str(sys.version_info[1])
 libpath = os.path.abspath(__file__)
@@ -21,20 +23,302 @@ _lzc = ctypes.CDLL(libpath)
 _lzc.lz_complexity.argtypes = (ndpointer(ctypes.c_int), ctypes.c_int)
 _lzc.lz_complexity2.argtypes = (ndpointer(ctypes.c_int), ctypes.c_int, ctypes.c_int)
 
+# The kernels are specialised on the element width; only equality of elements
+# matters to the parse, so signed and unsigned types of one width share a kernel.
+_kernel_dtypes = {1: uint8, 4: int32, 8: int64}
+_kernel_suffixes = {1: "u8", 4: "i32", 8: "i64"}
+for _width, _dtype in _kernel_dtypes.items():
+    _sfx = _kernel_suffixes[_width]
+    _seq = ndpointer(_dtype, flags="C_CONTIGUOUS")
+    _out = ndpointer(int64, flags="C_CONTIGUOUS")
+    _fn = getattr(_lzc, "lz_complexity_" + _sfx)
+    _fn.argtypes = (_seq, ctypes.c_int64)
+    _fn.restype = ctypes.c_int64
+    _fn = getattr(_lzc, "lz_complexity_suffix_" + _sfx)
+    _fn.argtypes = (_seq, ctypes.c_int64)
+    _fn.restype = ctypes.c_int64
+    _fn = getattr(_lzc, "lz_complexity2_" + _sfx)
+    _fn.argtypes = (_seq, ctypes.c_int64, ctypes.c_int64)
+    _fn.restype = ctypes.c_int64
+    for _name in ["lz_complexity_batch_", "lz_complexity_pairs_"]:
+        _fn = getattr(_lzc, _name + _sfx)
+        _fn.argtypes = (_seq, ctypes.c_int64, ctypes.c_int64, _out, ctypes.c_int)
+    getattr(_lzc, "lz_complexity_batch_" + _sfx).restype = None
+    getattr(_lzc, "lz_complexity_pairs_" + _sfx).restype = ctypes.c_int
+    _fn = getattr(_lzc, "lz_resume_" + _sfx)
+    _fn.argtypes = (
+        _seq,
+        ctypes.c_int64,
+        ctypes.c_void_p,
+        ctypes.c_int64,
+        _out,
+        ctypes.c_int,
+        ctypes.c_void_p,
+    )
+    _fn.restype = ctypes.c_int64
+    _fn = getattr(_lzc, "lz_complexity_windowed_" + _sfx)
+    _fn.argtypes = (_seq, ctypes.c_int64, ctypes.c_int64, ctypes.c_int64, _out)
+    _fn.restype = ctypes.c_int
 
-def lz_complexity(s):
+
+def _as_kernel_array(s):
+    """
+    Returns s as a C-contiguous array with a dtype one of the kernels accepts,
+    and the suffix of those kernels. Contiguous uint8, bool, int8, (u)int32
+    and (u)int64 arrays are passed through without a copy; bytes and str are
+    read through numpy.frombuffer, and anything else is copied into c_int as before.
+    """
+    if isinstance(s, str):
+        if s.isascii():
+            s = s.encode("ascii")
+        else:
+            s = frombuffer(s.encode("utf-32-le"), dtype=int32)
+    if isinstance(s, (bytes, bytearray)):
+        s = frombuffer(s, dtype=uint8)
+    elif isinstance(s, memoryview):
+        s = asarray(s)
+    if not isinstance(s, ndarray) or s.dtype.kind not in "biu":
+        s = array(s, dtype=ctypes.c_int)
+    elif s.dtype.itemsize not in _kernel_dtypes:
+        s = s.astype(int32)
+    s = ascontiguousarray(s)
+    width = s.dtype.itemsize
+    return s.view(_kernel_dtypes[width]), _kernel_suffixes[width]
+
+
+def lz_complexity(s, engine="ks"):
+    """
+    Lempel-Ziv complexity of a sequence, calculated by the C extension.
+
+    INPUT:
+        s : array, list, bytes or str, required
+          sequence to calculate complexity for (at least 2 elements); contiguous
+          uint8, bool, int32 and int64 arrays are used without a copy
+
+        engine : string, optional
+          'ks' : the Kaspar-Schuster scan, fastest for short or complex sequences
+          'suffix' : the same phrase count from the suffix array of s in
+                     O(n log n) time, for long or low-complexity sequences
+                     (uses about 50 bytes of memory per element)
+    """
     global _lzc
-    # coerce input arguments to ctypes
-    s = array(s, dtype=ctypes.c_int)
-    N = ctypes.c_int(len(s))
-    lzc = _lzc.lz_complexity(s, N)
+    s, sfx = _as_kernel_array(s)
+    if engine == "ks":
+        lzc = getattr(_lzc, "lz_complexity_" + sfx)(s, len(s))
+    elif engine == "suffix":
+        if len(s) < 2:
+            raise ValueError("Sequence must have at least 2 elements")
+        lzc = getattr(_lzc, "lz_complexity_suffix_" + sfx)(s, len(s))
+        if lzc < 0:
+            raise MemoryError("Not enough memory for the suffix array of the sequence")
+    else:
+        raise ValueError("Unknown engine: " + str(engine))
     return lzc
 
 
 def lz_complexity2(s, threshold):
+    """
+    Same as lz_complexity, but stops counting once the complexity exceeds threshold.
+    """
+    global _lzc
+    s, sfx = _as_kernel_array(s)
+    lzc = getattr(_lzc, "lz_complexity2_" + sfx)(s, len(s), threshold)
+    return lzc
+
+
+def lz_complexity_batch(s, threads=1):
+    """
+    Calculates the LZC of every row of a 2-D array with a single call into the
+    C extension, so there is no per-row ctypes overhead (and no copy at all for
+    contiguous arrays of a supported dtype).
+
+    INPUT:
+        s : 2-D array-like, required
+          one sequence per row, all rows the same length (at least 2)
+
+        threads : int, optional
+          number of OS threads the rows are spread over
+
+    OUTPUT:
+        lzc : numpy int64 array, the complexity of each row
+    """
+    global _lzc
+    s, sfx = _as_kernel_array(s)
+    if s.ndim != 2:
+        raise ValueError("Input must be a 2-D array")
+    rows, N = s.shape
+    if N < 2:
+        raise ValueError("Rows must have at least 2 elements")
+    lzc = empty(rows, dtype=int64)
+    if rows > 0:
+        getattr(_lzc, "lz_complexity_batch_" + sfx)(
+            s, rows, N, lzc, max(int(threads), 1)
+        )
+    return lzc
+
+
+def lz_complexity_pairs(s, threads=1):
+    """
+    Calculates the LZC of the concatenation of every pair of rows of a 2-D
+    array in the C extension, without building any of the concatenations.
+
+    INPUT:
+        s : 2-D array-like, required
+          one sequence per row, all rows the same length (at least 1)
+
+        threads : int, optional
+          number of OS threads; each gets a block of pairs of about the same size
+
+    OUTPUT:
+        lzc : numpy int64 array, rows x rows
+          lzc[i, j] is the complexity of row j followed by row i for i <= j;
+          the lower triangle is zero
+    """
     global _lzc
-    # coerce input arguments to ctypes
-    s = array(s, dtype=ctypes.c_int)
-    N = ctypes.c_int(len(s))
-    lzc = _lzc.lz_complexity2(s, N, ctypes.c_int(threshold))
+    s, sfx = _as_kernel_array(s)
+    if s.ndim != 2:
+        raise ValueError("Input must be a 2-D array")
+    rows, N = s.shape
+    if N < 1:
+        raise ValueError("Rows must have at least 1 element")
+    lzc = zeros((rows, rows), dtype=int64)
+    if rows > 0:
+        status = getattr(_lzc, "lz_complexity_pairs_" + sfx)(
+            s, rows, N, lzc, max(int(threads), 1)
+        )
+        if status != 0:
+            raise MemoryError("Not enough memory for the parse states of the rows")
     return lzc
+
+
+def lz_complexity_windowed(s, window, step=1):
+    """
+    LZC of every window s[t:t+window], t = 0, step, 2*step, ..., calculated by
+    the C extension. The suffix array of s is built once and shared by all of the
+    windows, so each LZ phrase costs O(log n) instead of a rescan of the window
+    history (see lz_complexity_python.lz_complexity_windowed).
+
+    INPUT:
+        s : array, list, bytes or str, required
+          sequence to calculate the complexity series for
+
+        window : int, required
+          window length, at least 2
+
+        step : int, optional
+          distance between the starts of consecutive windows
+
+    OUTPUT:
+        lzc : numpy int64 array, complexity of each window
+    """
+    global _lzc
+    if window < 2:
+        raise ValueError("window must be at least 2")
+    if step < 1:
+        raise ValueError("step must be at least 1")
+    s, sfx = _as_kernel_array(s)
+    N = len(s)
+    if N < window:
+        return zeros(0, dtype=int64)
+    lzc = empty((N - window) // step + 1, dtype=int64)
+    status = getattr(_lzc, "lz_complexity_windowed_" + sfx)(s, N, window, step, lzc)
+    if status != 0:
+        raise MemoryError("Not enough memory for the suffix array of the sequence")
+    return lzc
+
+
+class LZParser(object):
+    """
+    A resumable Kaspar-Schuster parse. A sequence x is parsed once, as far as x
+    alone decides the phrases; the parse can then be forked cheaply and each
+    fork extended with a different continuation y, so that the LZC of many
+    concatenations x + y reuses the work done on x. The parsed sequences are
+    shared between forks, never copied.
+
+        px = LZParser(x)
+        px.complexity()                       # lz_complexity(x)
+        px.fork().extend(y).complexity()      # lz_complexity(concatenate((x, y)))
+        px.fork().extend(y).phrases()         # start of every phrase of x + y
+
+    Appended elements are converted to the element type of the parsed sequence.
+    A fork that is extended twice has to copy x once to keep the kernels to
+    two segments.
+    """
+
+    def __init__(self, s):
+        # the sequence is held as a head and an optional tail segment
+        self._head, self._sfx = _as_kernel_array(s)
+        self._tail = None
+        # start of the next phrase and phrases counted so far
+        self._state = array([1, 1], dtype=int64)
+        self._starts = [array([0], dtype=int64)]
+        self._advance()
+
+    def __len__(self):
+        return len(self._head) + (0 if self._tail is None else len(self._tail))
+
+    def _scan(self, state, open, bounds=None):
+        global _lzc
+        tail = self._head if self._tail is None else self._tail
+        return getattr(_lzc, "lz_resume_" + self._sfx)(
+            self._head,
+            len(self._head),
+            tail.ctypes.data,
+            0 if self._tail is None else len(self._tail),
+            state,
+            open,
+            None if bounds is None else bounds.ctypes.data,
+        )
+
+    def _advance(self):
+        # parse as far as the current elements decide the phrases
+        bounds = empty(max(len(self) - self._state[0] + 1, 1), dtype=int64)
+        nbounds = self._scan(self._state, 1, bounds)
+        if nbounds > 0:
+            self._starts.append(bounds[:nbounds].copy())
+
+    def fork(self):
+        """
+        Returns an independent copy of the parse that shares the parsed elements.
+        """
+        other = object.__new__(LZParser)
+        other._head = self._head
+        other._sfx = self._sfx
+        other._tail = self._tail
+        other._state = self._state.copy()
+        other._starts = list(self._starts)
+        return other
+
+    def extend(self, y):
+        """
+        Appends the sequence y and continues the parse. Returns the parser.
+        """
+        y, sfx = _as_kernel_array(y)
+        if sfx != self._sfx:
+            y = y.astype(self._head.dtype)
+        if self._tail is not None:
+            self._head = concatenate((self._head, self._tail))
+        self._tail = y
+        self._advance()
+        return self
+
+    def complexity(self):
+        """
+        LZC of the sequence parsed so far (the same as lz_complexity).
+        """
+        if len(self) < 2:
+            raise ValueError("Sequence must have at least 2 elements")
+        state = self._state.copy()
+        self._scan(state, 0)
+        return int(state[1])
+
+    def phrases(self):
+        """
+        Start position of every phrase of the complete parse of the sequence.
+        """
+        if len(self) < 2:
+            raise ValueError("Sequence must have at least 2 elements")
+        state = self._state.copy()
+        bounds = empty(max(len(self) - state[0] + 1, 1), dtype=int64)
+        nbounds = self._scan(state, 0, bounds)
+        return concatenate(self._starts + [bounds[:nbounds]])
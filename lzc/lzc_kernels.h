@@ -0,0 +1,354 @@
+/*
+LZC kernels for one element type. lzc.c includes this file once per supported
+element type, with LZC_T set to the type and LZC_SFX to the suffix appended to
+every function name (e.g. lz_complexity_u8 for uint8_t elements). Only equality
+of elements matters to the parse, so signed and unsigned types of the same
+width share one set of kernels.
+*/
+
+#define LZC_FN(name) LZC_CAT(name, LZC_SFX)
+
+/*
+This function will calculate the lzc of a sequence but stop iteration if a threshold is reached
+    INPUT:
+      *s: LZC_T array
+      N: length of the array
+      threshold: stop once the lzc exceeds this (LZC_NO_THRESHOLD never stops)
+*/
+
+static int64_t LZC_FN(lz_scan)(const LZC_T *s, int64_t N, int64_t threshold)
+{
+  int64_t i = 0, k = 1, l = 1;
+  int64_t k_max = 1;
+  int64_t n = N-1;
+  int64_t lzc = 1;
+
+  while(1)
+  {
+    if (s[i+k-1] == s[l+k-1])
+    {
+      k += 1;
+      if (l+k >= n-1)
+      {
+        lzc += 1;
+        break;
+      }
+    }
+    else
+    {
+      if (k > k_max)
+      {
+        k_max = k;
+      }
+      i += 1;
+      if (i == l)
+      {
+        lzc += 1;
+        if (lzc > threshold)
+          break;
+        l += k_max;
+        if (l+1 > n)
+        {
+          break;
+        }
+        else
+        {
+          i = 0;
+          k = 1;
+          k_max = 1;
+        }
+      }
+      else
+      {
+        k = 1;
+      }
+    }
+  }
+  return lzc;
+}
+
+/*
+This function will continue the parse of the concatenation of two sequences
+from a saved state, without building the concatenation
+    INPUT:
+      *a: LZC_T array, first part of the sequence
+      Na: length of a
+      *b: LZC_T array, second part of the sequence (not read if Nb is 0)
+      Nb: length of b
+      *state: int64[2], {l, lzc}: the start of the next phrase and the number of
+              phrases counted so far, updated on return; a new parse starts
+              from {1, 1}
+      open: if nonzero, stop before the first phrase whose length could still
+            change if elements were appended, so the state can be resumed
+            with any continuation; otherwise parse to the end
+      *bounds: int64 array or NULL, receives the start of every phrase counted
+    OUTPUT:
+      the number of phrase starts written to bounds
+*/
+
+#define AT(p) ((p) < Na ? a[p] : b[(p)-Na])
+
+static int64_t LZC_FN(lz_resume_scan)(const LZC_T *a, int64_t Na, const LZC_T *b, int64_t Nb,
+                                      int64_t *state, int open, int64_t *bounds)
+{
+  int64_t i = 0, k = 1, l = state[0];
+  int64_t k_max = 1;
+  int64_t n = Na+Nb-1;
+  int64_t lzc = state[1];
+  int64_t nbounds = 0;
+
+  // a resumed parse may already be complete
+  if (lzc > 1 && l+1 > n)
+    return 0;
+  // the scan below could reach the end of the sequence
+  if (open && l >= n-2)
+    return 0;
+  while(1)
+  {
+    if (AT(i+k-1) == AT(l+k-1))
+    {
+      k += 1;
+      if (l+k >= n-1)
+      {
+        if (!open)
+        {
+          if (bounds != NULL)
+            bounds[nbounds++] = l;
+          lzc += 1;
+        }
+        break;
+      }
+    }
+    else
+    {
+      if (k > k_max)
+      {
+        k_max = k;
+      }
+      i += 1;
+      if (i == l)
+      {
+        if (bounds != NULL)
+          bounds[nbounds++] = l;
+        lzc += 1;
+        l += k_max;
+        if (l+1 > n || (open && l >= n-2))
+        {
+          break;
+        }
+        else
+        {
+          i = 0;
+          k = 1;
+          k_max = 1;
+        }
+      }
+      else
+      {
+        k = 1;
+      }
+    }
+  }
+  state[0] = l;
+  state[1] = lzc;
+  return nbounds;
+}
+
+#undef AT
+
+LZCEXPORT int64_t LZC_FN(lz_resume)(const LZC_T *a, int64_t Na, const LZC_T *b, int64_t Nb,
+                                    int64_t *state, int open, int64_t *bounds)
+{
+  return LZC_FN(lz_resume_scan)(a, Na, b, Nb, state, open, bounds);
+}
+
+LZCEXPORT int64_t LZC_FN(lz_complexity)(const LZC_T *s, int64_t N)
+{
+  return LZC_FN(lz_scan)(s, N, LZC_NO_THRESHOLD);
+}
+
+LZCEXPORT int64_t LZC_FN(lz_complexity2)(const LZC_T *s, int64_t N, int64_t threshold)
+{
+  return LZC_FN(lz_scan)(s, N, threshold);
+}
+
+/*
+This function will calculate the lzc of every row of a C-contiguous 2-D array
+    INPUT:
+      *s: LZC_T array, rows*N elements
+      rows: number of sequences
+      N: length of each sequence
+      *out: int64 array, receives the lzc of each row
+      nthreads: int, number of threads to spread the rows over
+*/
+
+typedef struct
+{
+  const LZC_T *s;
+  int64_t rows;
+  int64_t N;
+  int64_t *out;
+} LZC_FN(batch_ctx);
+
+static void LZC_FN(batch_task)(void *p, int tid, int nthreads)
+{
+  LZC_FN(batch_ctx) *c = (LZC_FN(batch_ctx) *)p;
+  int64_t r;
+  int64_t start = c->rows*tid/nthreads;
+  int64_t stop = c->rows*(tid+1)/nthreads;
+
+  for (r = start; r < stop; r++)
+    c->out[r] = LZC_FN(lz_scan)(c->s + r*c->N, c->N, LZC_NO_THRESHOLD);
+}
+
+LZCEXPORT void LZC_FN(lz_complexity_batch)(const LZC_T *s, int64_t rows, int64_t N, int64_t *out, int nthreads)
+{
+  LZC_FN(batch_ctx) c;
+
+  c.s = s;
+  c.rows = rows;
+  c.N = N;
+  c.out = out;
+  if (nthreads > rows)
+    nthreads = (int)rows;
+  lzc_parallel(LZC_FN(batch_task), &c, nthreads);
+}
+
+/*
+This function will calculate the lzc of the concatenation of every pair of rows
+of a C-contiguous 2-D array
+    INPUT:
+      *s: LZC_T array, rows*N elements
+      rows: number of sequences
+      N: length of each sequence
+      *out: int64 array, rows*rows elements; out[i*rows+j] receives the lzc of
+            row j followed by row i for every i <= j (the lower triangle is untouched)
+      nthreads: int, number of threads; each gets a block of columns j holding
+                about the same number of pairs
+Every row is parsed once on its own, as far as the row alone decides the
+phrases, and each concatenation resumes from the state of its first row.
+Returns 0, or -1 if memory runs out.
+*/
+
+typedef struct
+{
+  const LZC_T *s;
+  int64_t rows;
+  int64_t N;
+  int64_t *states;
+  int64_t *out;
+} LZC_FN(pairs_ctx);
+
+static void LZC_FN(prefix_task)(void *p, int tid, int nthreads)
+{
+  LZC_FN(pairs_ctx) *c = (LZC_FN(pairs_ctx) *)p;
+  int64_t r;
+  int64_t start = c->rows*tid/nthreads;
+  int64_t stop = c->rows*(tid+1)/nthreads;
+
+  for (r = start; r < stop; r++)
+  {
+    c->states[2*r] = 1;
+    c->states[2*r+1] = 1;
+    LZC_FN(lz_resume_scan)(c->s + r*c->N, c->N, NULL, 0, c->states + 2*r, 1, NULL);
+  }
+}
+
+static void LZC_FN(pairs_task)(void *p, int tid, int nthreads)
+{
+  LZC_FN(pairs_ctx) *c = (LZC_FN(pairs_ctx) *)p;
+  int64_t total = c->rows*(c->rows+1)/2;
+  int64_t lo = total*tid/nthreads, hi = total*(tid+1)/nthreads;
+  int64_t done = 0;
+  int64_t i, j;
+  int64_t state[2];
+
+  // column j holds j+1 pairs; this thread takes the columns whose first pair
+  // falls in [lo, hi)
+  for (j = 0; j < c->rows; j++)
+  {
+    if (done >= hi)
+      break;
+    if (done >= lo)
+    {
+      for (i = 0; i <= j; i++)
+      {
+        state[0] = c->states[2*j];
+        state[1] = c->states[2*j+1];
+        LZC_FN(lz_resume_scan)(c->s + j*c->N, c->N, c->s + i*c->N, c->N, state, 0, NULL);
+        c->out[i*c->rows+j] = state[1];
+      }
+    }
+    done += j+1;
+  }
+}
+
+LZCEXPORT int LZC_FN(lz_complexity_pairs)(const LZC_T *s, int64_t rows, int64_t N, int64_t *out, int nthreads)
+{
+  LZC_FN(pairs_ctx) c;
+
+  c.s = s;
+  c.rows = rows;
+  c.N = N;
+  c.out = out;
+  c.states = (int64_t *)malloc(2*rows*sizeof(int64_t));
+  if (c.states == NULL)
+    return -1;
+  if (nthreads > rows)
+    nthreads = (int)rows;
+  lzc_parallel(LZC_FN(prefix_task), &c, nthreads);
+  lzc_parallel(LZC_FN(pairs_task), &c, nthreads);
+  free(c.states);
+  return 0;
+}
+
+/*
+This function will calculate the lzc of a sequence from its suffix array
+    INPUT:
+      *s: LZC_T array
+      N: length of s, at least 2
+Returns the lzc, or -1 if memory runs out.
+*/
+
+LZCEXPORT int64_t LZC_FN(lz_complexity_suffix)(const LZC_T *s, int64_t N)
+{
+  int64_t i, lzc;
+  int64_t *x = (int64_t *)malloc(N*sizeof(int64_t));
+
+  if (x == NULL)
+    return -1;
+  for (i = 0; i < N; i++)
+    x[i] = (int64_t)s[i];
+  lzc = lz_suffix(x, N);
+  free(x);
+  return lzc;
+}
+
+/*
+This function will calculate the lzc of every window s[t:t+window],
+t = 0, step, 2*step, ...
+    INPUT:
+      *s: LZC_T array
+      N: length of s
+      window: window length, at least 2 and at most N
+      step: distance between window starts, at least 1
+      *out: int64 array, receives the lzc of each window
+Returns 0, or -1 if memory runs out.
+*/
+
+LZCEXPORT int LZC_FN(lz_complexity_windowed)(const LZC_T *s, int64_t N, int64_t window, int64_t step, int64_t *out)
+{
+  int64_t i;
+  int status;
+  int64_t *x = (int64_t *)malloc(N*sizeof(int64_t));
+
+  if (x == NULL)
+    return -1;
+  for (i = 0; i < N; i++)
+    x[i] = (int64_t)s[i];
+  status = lz_sweep(x, N, window, step, out);
+  free(x);
+  return status;
+}
+
+#undef LZC_FN
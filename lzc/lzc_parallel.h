@@ -0,0 +1,125 @@
+/*
+A minimal pool of OS threads, shared by the lzc and ppm extensions. Each
+extension includes this file once, so the functions are static to it.
+*/
+#ifndef LZC_PARALLEL_H_INCLUDED
+#define LZC_PARALLEL_H_INCLUDED 1
+
+#include <stdlib.h>
+
+#if defined(_WIN32)
+#include <windows.h>
+#else
+#include <pthread.h>
+#endif
+
+/*
+Runs task(ctx, tid, nthreads) on nthreads OS threads and waits for all of them.
+If a thread cannot be started, its share of the work is done on the calling thread.
+*/
+typedef void (*lzc_task)(void *ctx, int tid, int nthreads);
+
+typedef struct
+{
+  lzc_task task;
+  void *ctx;
+  int tid;
+  int nthreads;
+} lzc_thread_arg;
+
+#if defined(_WIN32)
+static DWORD WINAPI lzc_thread_main(LPVOID p)
+{
+  lzc_thread_arg *a = (lzc_thread_arg *)p;
+  a->task(a->ctx, a->tid, a->nthreads);
+  return 0;
+}
+#else
+static void *lzc_thread_main(void *p)
+{
+  lzc_thread_arg *a = (lzc_thread_arg *)p;
+  a->task(a->ctx, a->tid, a->nthreads);
+  return NULL;
+}
+#endif
+
+static void lzc_parallel(lzc_task task, void *ctx, int nthreads)
+{
+  int t;
+  lzc_thread_arg *args;
+#if defined(_WIN32)
+  HANDLE *threads;
+#else
+  pthread_t *threads;
+  int *started;
+#endif
+
+  if (nthreads <= 1)
+  {
+    task(ctx, 0, 1);
+    return;
+  }
+  args = (lzc_thread_arg *)malloc(nthreads*sizeof(lzc_thread_arg));
+#if defined(_WIN32)
+  threads = (HANDLE *)malloc(nthreads*sizeof(HANDLE));
+#else
+  threads = (pthread_t *)malloc(nthreads*sizeof(pthread_t));
+  started = (int *)malloc(nthreads*sizeof(int));
+#endif
+#if defined(_WIN32)
+  if (args == NULL || threads == NULL)
+#else
+  if (args == NULL || threads == NULL || started == NULL)
+#endif
+  {
+#if !defined(_WIN32)
+    free(started);
+#endif
+    free(args);
+    free(threads);
+    for (t = 0; t < nthreads; t++)
+      task(ctx, t, nthreads);
+    return;
+  }
+  for (t = 0; t < nthreads; t++)
+  {
+    args[t].task = task;
+    args[t].ctx = ctx;
+    args[t].tid = t;
+    args[t].nthreads = nthreads;
+  }
+  // thread 0 is the calling thread
+  for (t = 1; t < nthreads; t++)
+  {
+#if defined(_WIN32)
+    threads[t] = CreateThread(NULL, 0, lzc_thread_main, &args[t], 0, NULL);
+    if (threads[t] == NULL)
+      task(ctx, t, nthreads);
+#else
+    started[t] = (pthread_create(&threads[t], NULL, lzc_thread_main, &args[t]) == 0);
+    if (!started[t])
+      task(ctx, t, nthreads);
+#endif
+  }
+  task(ctx, 0, nthreads);
+  for (t = 1; t < nthreads; t++)
+  {
+#if defined(_WIN32)
+    if (threads[t] != NULL)
+    {
+      WaitForSingleObject(threads[t], INFINITE);
+      CloseHandle(threads[t]);
+    }
+#else
+    if (started[t])
+      pthread_join(threads[t], NULL);
+#endif
+  }
+#if !defined(_WIN32)
+  free(started);
+#endif
+  free(threads);
+  free(args);
+}
+
+#endif
@@ -1,44 +1,66 @@
-import gzip, bz2
-import snappy
-from complexity.ncd import ppm_compress_mod, ppmc
-from complexity.ncd import arithmeticcoding, ppmmodel
+from complexity.ncd.compressors import Compressor, register_compressor, get_compressor
 from complexity.lzc import lzc
-import contextlib, sys, os
-import scipy.cluster.hierarchy as hier
+from complexity.ncd.ppmc import ppmc_lengths
+from complexity.utilities import share_array, attach_array
+from multiprocessing import Pool
 import numpy as np
-import matplotlib.pyplot as plt
-import pylab
+import hashlib, json, os
 
 
-def NCD(spike_array, compressor, triu_only=False):
+def NCD(spike_array, compressor, triu_only=False, workers=1, encoding=None):
     """
     Generates the normalized compression distance matrix of a spike array. Assumes that C_xy =~ C_yx.
 
-        INPUT: spike_array, numpy array of arrays; compressor; triu_only=True to get just the pairwise NCDs
+        INPUT: spike_array, numpy array of arrays; compressor; triu_only=True to get just the pairwise NCDs;
+               workers, number of threads used by the 'lz' compressor, or of processes
+                        that tiles of the matrix are spread over for the other compressors;
+               encoding, how sequences are encoded for the compressor ('raw', 'uint8',
+                         'packbits' or 'ascii'), None for the compressor's default
 
         OUTPUT: hmap, numpy array of arrays
     """
     L = len(spike_array)
     hmap = np.zeros([L, L], dtype=np.float32)
+    ppmc_rows = _ppmc_rows(spike_array, compressor, encoding)
 
     if compressor == "lz":
+        rows = _lz_rows(spike_array, encoding)
         # Calculate each node's lz_complexity
-        lzcs = np.zeros(L)
-        for i in range(L):
-            lzcs[i] = lzc.lz_complexity(spike_array[i, :])
+        lzcs = lzc.lz_complexity_batch(rows, threads=workers)
+        # lz_complexity of every concatenation spike_array[m] + spike_array[n], n <= m
+        C_xy = lzc.lz_complexity_pairs(rows, threads=workers)
 
         # Calculate the pairwise NCDs
-        for m in range(L):
-            for n in range(m + 1):
-                xy = np.concatenate((spike_array[m], spike_array[n]))
-                hmap[n, m] = (lzc.lz_complexity(xy) - min(lzcs[m], lzcs[n])) / max(
-                    lzcs[m], lzcs[n]
-                )
+        n, m = np.triu_indices(L)
+        hmap[n, m] = (C_xy[n, m] - np.minimum(lzcs[m], lzcs[n])) / np.maximum(
+            lzcs[m], lzcs[n]
+        )
+    elif ppmc_rows is not None:
+        # ppmc lengths of every node and of every concatenation in one call
+        i, j = np.indices([L, L]).reshape(2, -1)
+        C, C_pairs = ppmc_lengths(ppmc_rows, pairs=np.column_stack((i, j)))
+        C, C_pairs = np.round(C), np.round(C_pairs).reshape(L, L)
+
+        # Calculate the pairwise NCDs
+        n, m = np.triu_indices(L)
+        hmap[n, m] = (np.minimum(C_pairs[m, n], C_pairs[n, m]) - np.minimum(C[m], C[n])) / np.maximum(
+            C[m], C[n]
+        )
+    elif workers > 1 and L > 1 and np.asarray(spike_array).dtype != object:
+        _NCD_parallel(np.asarray(spike_array), get_compressor(compressor, encoding), hmap, workers)
     else:
+        # Prepare and compress each sequence once
+        compressor = get_compressor(compressor, encoding)
+        x = [compressor.encode(s) for s in spike_array]
+        states = [compressor.start(xi) for xi in x]
+        C = [state.length() for state in states]
+
         # Calculate the pairwise NCDs
         for m in range(L):
             for n in range(m + 1):
-                hmap[n, m] = NCD_pairwise(spike_array[m], spike_array[n], compressor)
+                C_xy = states[m].length_with(x[n])
+                C_yx = states[n].length_with(x[m])
+                hmap[n, m] = _ncd(C[m], C[n], C_xy, C_yx)
 
     if triu_only == False:
         # Mirror array over the diagonal
@@ -52,14 +74,222 @@ def NCD(spike_array, compressor, triu_only=False):
     return hmap
 
 
-def NCD_pairwise(s1, s2, compressor):
+def _lz_rows(spike_array, encoding):
+    "The rows of spike_array encoded for the 'lz' compressor, as one array for lzc"
+    if encoding in [None, "raw"]:
+        return spike_array
+    compressor = get_compressor("lz", encoding)
+    x = [compressor.encode(s) for s in spike_array]
+    return np.array([np.frombuffer(xi, dtype=np.uint8) if isinstance(xi, bytes) else xi for xi in x])
+
+
+def _NCD_parallel(spike_array, compressor, hmap, workers):
+    """
+    Fills the upper triangle of hmap as the serial loop in NCD does, with the work
+    spread over a pool of processes that read spike_array from shared memory. The
+    compressed length of each sequence is computed once, then square tiles of the
+    triangle are computed and gathered into hmap.
+    """
+    L = len(spike_array)
+    # several tiles per worker so that they even out
+    size = max(1, int(np.ceil(L / np.sqrt(8.0 * workers))))
+    tiles = [(i0, j0) for i0 in range(0, L, size) for j0 in range(i0, L, size)]
+    # tiles off the diagonal hold twice as many pairs, so they are started first
+    tiles.sort(key=lambda t: t[0] == t[1])
+    shm, spec = share_array(spike_array)
+    try:
+        with Pool(workers, initializer=_NCD_attach, initargs=(spec, compressor)) as pool:
+            C = pool.map(_NCD_length, range(L), chunksize=max(1, L // (4 * workers)))
+            tasks = [(i0, j0, C[i0 : i0 + size], C[j0 : j0 + size]) for i0, j0 in tiles]
+            for i0, j0, block in pool.imap_unordered(_NCD_tile, tasks):
+                hmap[i0 : i0 + block.shape[0], j0 : j0 + block.shape[1]] = block
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+_shared = None
+
+
+def _NCD_attach(spec, compressor):
+    """
+    Pool initializer, attaches the shared spike array once per worker. The Compressor
+    itself is passed rather than its name, since a compressor registered at run time
+    is not in the registry of a worker that was spawned rather than forked
+    """
+    global _shared
+    _shared = (attach_array(spec), compressor)
+
+
+def _NCD_length(m):
+    (_, spike_array), compressor = _shared
+    return compressor.start(compressor.encode(spike_array[m])).length()
+
+
+def _NCD_tile(task):
+    "NCDs of rows n (from i0) against rows m (from j0), n <= m, as in NCD"
+    (_, spike_array), compressor = _shared
+    return task[0], task[1], _NCD_block(spike_array, compressor, *task)
+
+
+def _NCD_block(spike_array, compressor, i0, j0, C_n, C_m, diagonal=True, one_way=False):
+    """
+    Block of the NCDs of _NCD_tile, with n < m only if diagonal is False; if one_way
+    is True only the concatenation of row m then row n is compressed, as in the
+    'lz' branch of NCD
+    """
+    x_n = [compressor.encode(s) for s in spike_array[i0 : i0 + len(C_n)]]
+    x_m = [compressor.encode(s) for s in spike_array[j0 : j0 + len(C_m)]]
+    states_n = [compressor.start(x) for x in x_n]
+    states_m = [compressor.start(x) for x in x_m]
+    block = np.zeros([len(x_n), len(x_m)])
+    for b in range(len(x_m)):
+        for a in range(len(x_n)):
+            if i0 + a > j0 + b or (i0 + a == j0 + b and not diagonal):
+                break
+            C_xy = states_m[b].length_with(x_n[a])
+            C_yx = C_xy if one_way else states_n[a].length_with(x_m[b])
+            block[a, b] = _ncd(C_m[b], C_n[a], C_xy, C_yx)
+    return block
+
+
+def NCD_to_file(spike_array, compressor, path, tile_size=1000, rows=None, cols=None, workers=1, encoding=None):
+    """
+    Computes the pairwise NCDs of NCD(spike_array, compressor, triu_only=True) into
+    a memory-mapped .npy file, so that the matrix never has to fit in memory and
+    an interrupted run can be resumed.
+
+    The upper triangle is computed in square tiles whose first row and column are
+    multiples of tile_size. Each finished tile is flushed to the file and recorded
+    in a JSON manifest next to it; calling again with the same arguments skips the
+    recorded tiles. The manifest holds a hash of spike_array, and one written for
+    other data or arguments raises a ValueError. Several processes or machines sharing the file can each take
+    a block of tiles through rows and cols, with blocks aligned to tile_size; each
+    block keeps its own manifest. The file should then be created first, e.g. by
+    a call with an empty block.
+
+        INPUT: spike_array, numpy array of arrays; compressor, as in NCD;
+               path, the .npy file holding the condensed upper triangle, in the order
+                     of np.triu_indices(L, k=1), as float32;
+               tile_size, number of rows and columns of a tile;
+               rows, cols, (start, stop) of the first rows and columns of the tiles
+                           to compute, None for all;
+               workers, number of processes the tiles are spread over;
+               encoding, as in NCD
+
+        OUTPUT: the condensed NCDs, numpy memmap of the file; tiles that were not
+                computed hold zeros
+    """
+    # the 'lz' distances only compress one concatenation, whatever the encoding
+    one_way = compressor == "lz"
+    compressor = get_compressor(compressor, encoding)
+    spike_array = np.asarray(spike_array)
+    L = len(spike_array)
+    size = L * (L - 1) // 2
+    if os.path.exists(path):
+        out = np.lib.format.open_memmap(path, mode="r+")
+        if out.shape != (size,) or out.dtype != np.float32:
+            raise ValueError(path + " does not hold the NCDs of " + str(L) + " sequences")
+    else:
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(size,))
+    r0, r1 = (0, L) if rows is None else rows
+    c0, c1 = (0, L) if cols is None else cols
+    if rows is None and cols is None:
+        manifest = path + ".manifest.json"
+    else:
+        manifest = "%s.%d-%d.%d-%d.manifest.json" % (path, r0, r1, c0, c1)
+    params = {
+        "size": L,
+        "tile_size": tile_size,
+        "compressor": compressor.name,
+        "encoding": compressor.encoding,
+        "data": _fingerprint(spike_array),
+    }
+    done = set()
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            record = json.load(f)
+        if record["params"] != params:
+            raise ValueError(manifest + " was written with other arguments: " + str(record["params"]))
+        done = set(tuple(tile) for tile in record["tiles"])
+
+    starts = range(0, L, tile_size)
+    tiles = [
+        (i0, j0)
+        for i0 in starts
+        for j0 in starts
+        if r0 <= i0 < r1 and c0 <= j0 < c1 and i0 <= j0 and (i0, j0) not in done
+    ]
+    if len(tiles) == 0:
+        return out
+
+    # compressed length of every sequence the tiles need
+    needed = set()
+    for i0, j0 in tiles:
+        needed.update(range(i0, min(i0 + tile_size, L)), range(j0, min(j0 + tile_size, L)))
+    needed = sorted(needed)
+    C = np.zeros(L)
+
+    def record_tile(i0, j0, block):
+        for a in range(block.shape[0]):
+            n = i0 + a
+            m = max(j0, n + 1)
+            if m >= j0 + block.shape[1]:
+                continue
+            base = n * L - n * (n + 1) // 2 - n - 1
+            out[base + m : base + j0 + block.shape[1]] = block[a, m - j0 :]
+        out.flush()
+        done.add((i0, j0))
+        # the manifest is replaced whole, so a crash leaves the old one or the new one
+        with open(manifest + ".tmp", "w") as f:
+            json.dump({"params": params, "tiles": sorted(done)}, f)
+        os.replace(manifest + ".tmp", manifest)
+
+    def task(i0, j0):
+        return (i0, j0, C[i0 : i0 + tile_size], C[j0 : j0 + tile_size], False, one_way)
+
+    if workers <= 1:
+        for i in needed:
+            C[i] = compressor.start(compressor.encode(spike_array[i])).length()
+        for i0, j0 in tiles:
+            record_tile(i0, j0, _NCD_block(spike_array, compressor, *task(i0, j0)))
+        return out
+    shm, spec = share_array(spike_array)
+    try:
+        with Pool(workers, initializer=_NCD_attach, initargs=(spec, compressor)) as pool:
+            C[needed] = pool.map(_NCD_length, needed, chunksize=max(1, len(needed) // (4 * workers)))
+            for i0, j0, block in pool.imap_unordered(_NCD_tile, [task(i0, j0) for i0, j0 in tiles]):
+                record_tile(i0, j0, block)
+    finally:
+        shm.close()
+        shm.unlink()
+    return out
+
+
+def _fingerprint(spike_array):
+    "sha256 of the dtype, shape and contents of spike_array, to tell whether a manifest is for the same data"
+    h = hashlib.sha256()
+    if spike_array.dtype == object:
+        # rows of different lengths, hashed one by one
+        rows = [np.ascontiguousarray(row) for row in spike_array]
+    else:
+        rows = [np.ascontiguousarray(spike_array)]
+    for row in rows:
+        h.update(("%s %s;" % (row.dtype.str, row.shape)).encode())
+        h.update(row.tobytes())
+    return h.hexdigest()
+
+
+def NCD_pairwise(s1, s2, compressor, encoding=None):
     """
     Calculates the normalized compression distance between two
     sequences using the compressor specified.
 
         INPUT:
             s1, s2: numpy arrays, any int dtype acceptable but uint8 recommended
-            compressor: gzip, bz2, 'gzip_padded'(pads x2), snappy, 'ppm', 'ppmc', 'lz','nlz'
+            compressor: gzip, bz2, 'gzip_padded'(pads x2), snappy, 'ppm', 'ppmc', 'lz','nlz',
+                        the name of any of these or of a compressor added with register_compressor
+            encoding: 'raw', 'uint8', 'packbits' or 'ascii', None for the compressor's default
         OUTPUT:
             NCD: numpy float
 
@@ -67,105 +297,79 @@ def NCD_pairwise(s1, s2, compressor):
     but NCD is a ratio, so a conversion to bits would be pointless. Compressed lengths
     in bits can be found using the function clen below.
     """
-    if compressor in [gzip, bz2, "gzip_padded"]:
-        # compressor.compress returns a bytes object, and len(bytesObject) gives the number of bytes
-        if compressor == "gzip_padded":
-            s1 = np.tile(s1, 3)
-            s2 = np.tile(s2, 3)
-            compressor = gzip
-        C_x = len(compressor.compress(s1))
-        C_y = len(compressor.compress(s2))
-        xy = np.concatenate((s1, s2))
-        yx = np.concatenate((s2, s1))
-        C_xy = len(compressor.compress(xy))
-        C_yx = len(compressor.compress(yx))
-        NCD = (np.amin([C_xy, C_yx]) - np.amin([C_x, C_y])) / np.amax([C_x, C_y])
-    if compressor == snappy:
-        # snappy.compress() also seems to return a bytes object, so len() returns the number of bytes of the compressed sequence
-        s1_str = "".join(map(str, s1))
-        s2_str = "".join(map(str, s2))
-        C_x = len(compressor.compress(s1_str))
-        C_y = len(compressor.compress(s2_str))
-        xy = "".join(map(str, np.concatenate((s1, s2))))
-        yx = "".join(map(str, np.concatenate((s2, s1))))
-        C_xy = len(compressor.compress(xy))
-        C_yx = len(compressor.compress(yx))
-        NCD = (np.amin([C_xy, C_yx]) - np.amin([C_x, C_y])) / np.amax([C_x, C_y])
-    if compressor == "ppm":
-        s12 = np.concatenate((s1, s2))
-        s21 = np.concatenate((s2, s1))
-        # sequences are converted to byte streams and then compressed into other byte streams
-        stream1 = ppm_compress_mod.compress(ppm_compress_mod.makestream(s1))
-        stream2 = ppm_compress_mod.compress(ppm_compress_mod.makestream(s2))
-        stream12 = ppm_compress_mod.compress(ppm_compress_mod.makestream(s12))
-        stream21 = ppm_compress_mod.compress(ppm_compress_mod.makestream(s21))
-        # the length of the byte stream/number of bytes in the compressed argument
-        C_x = len(stream1.getbuffer())
-        C_y = len(stream2.getbuffer())
-        C_xy = len(stream12.getbuffer())
-        C_yx = len(stream21.getbuffer())
-        NCD = (np.amin([C_xy, C_yx]) - np.amin([C_x, C_y])) / np.amax([C_x, C_y])
-    if compressor == "ppmc":
-        x = "".join(map(str, s1))
-        y = "".join(map(str, s2))
-        xy = "".join(map(str, np.concatenate((s1, s2))))
-        yx = "".join(map(str, np.concatenate((s2, s1))))
-        xobj = ppmc.ppmc(x)
-        yobj = ppmc.ppmc(y)
-        xyobj = ppmc.ppmc(xy)
-        yxobj = ppmc.ppmc(yx)
-        C_x = round(xobj.compress())
-        C_y = round(yobj.compress())
-        C_xy = round(xyobj.compress())
-        C_yx = round(yxobj.compress())
-        NCD = (np.amin([C_xy, C_yx]) - np.amin([C_x, C_y])) / np.amax([C_x, C_y])
-    if compressor == "lz":
-        C_x = lzc.lz_complexity(s1)
-        C_y = lzc.lz_complexity(s2)
-        C_xy = lzc.lz_complexity(np.concatenate((s1, s2)))
-        C_yx = lzc.lz_complexity(np.concatenate((s2, s1)))
-        NCD = (np.amin([C_xy, C_yx]) - np.amin([C_x, C_y])) / np.amax([C_x, C_y])
-    if compressor == "nlz":
-        xy = np.concatenate((s1, s2))
-        yx = np.concatenate((s2, s1))
-        C_len = np.zeros(4)
-        for i, seq in enumerate([s1, s2, xy, yx]):
-            t = len(seq)
-            p = float(sum(seq)) / t
-            h = -p * np.log2(p) - (1 - p) * np.log2(1 - p)
-            c_st = h * t / np.log2(t)
-            C_len[i] = lzc.lz_complexity(seq) / c_st
-        NCD = (np.amin(C_len[2:]) - np.amin(C_len[:2])) / np.amax(C_len[:2])
-    return NCD
-
-
-def clen(x, compressor):
+    return NCD_one_to_many(s1, [s2], compressor, encoding)[0]
+
+
+def NCD_one_to_many(s, spike_array, compressor, encoding=None):
+    """
+    Calculates the normalized compression distance between one sequence and each
+    of many, as NCD_pairwise(s, spike_array[i], compressor) does. s is prepared and
+    compressed once, and with compressors that can be primed (gzip, 'gzip_padded',
+    'ppm', 'lz') each concatenation only costs compressing its second half.
+
+        INPUT: s, numpy array; spike_array, numpy array of arrays; compressor and encoding,
+               as in NCD_pairwise
+
+        OUTPUT: NCDs, numpy array of floats
+    """
+    if compressor == "ppmc" and len(spike_array) > 0 and all(np.shape(y) == np.shape(s) for y in spike_array):
+        ppmc_rows = _ppmc_rows(np.vstack((s, spike_array)), compressor, encoding)
+        if ppmc_rows is not None:
+            # ppmc lengths of s, of every sequence and of both of their concatenations in one call
+            others = np.arange(1, len(ppmc_rows))
+            first = np.zeros_like(others)
+            pairs = np.concatenate((np.column_stack((first, others)), np.column_stack((others, first))))
+            C, C_pairs = ppmc_lengths(ppmc_rows, pairs=pairs)
+            C, C_pairs = np.round(C), np.round(C_pairs).reshape(2, -1)
+            return (np.minimum(C_pairs[0], C_pairs[1]) - np.minimum(C[0], C[1:])) / np.maximum(C[0], C[1:])
+    compressor = get_compressor(compressor, encoding)
+    x = compressor.encode(s)
+    state_x = compressor.start(x)
+    C_x = state_x.length()
+    NCDs = np.zeros(len(spike_array))
+    for i, s2 in enumerate(spike_array):
+        y = compressor.encode(s2)
+        state_y = compressor.start(y)
+        NCDs[i] = _ncd(C_x, state_y.length(), state_x.length_with(y), state_y.length_with(x))
+    return NCDs
+
+
+def _ppmc_rows(spike_array, compressor, encoding):
+    """
+    The sequences as ppmc_lengths takes them if the compressor is 'ppmc' and its
+    'ascii' encoding writes each of their symbols as one character, the digits
+    0..9, so that ppmc_lengths gives the same lengths; None otherwise
+    """
+    if not (isinstance(compressor, str) and compressor == "ppmc" and encoding in [None, "ascii"]):
+        return None
+    rows = np.asarray(spike_array)
+    if rows.ndim != 2 or rows.dtype.kind not in "iu" or rows.size == 0:
+        return None
+    if rows.min() < 0 or rows.max() > 9:
+        return None
+    return rows
+
+
+def _ncd(C_x, C_y, C_xy, C_yx):
+    "NCD from the compressed lengths of x, y and both concatenations"
+    return (np.amin([C_xy, C_yx]) - np.amin([C_x, C_y])) / np.amax([C_x, C_y])
+
+
+def clen(x, compressor, encoding=None):
     """
     Determines the compressed length of a sequence in bits using the compressor
-    specified.
-    """
-    if compressor in [gzip, bz2, snappy]:
-        clen = (
-            len(compressor.compress(x)) * 8
-        )  # to get the clen in bits of the bytes object
-    if compressor == snappy:
-        x = "".join(map(str, x))
-        clen = (
-            len(compressor.compress(x)) * 8
-        )  # to get the clen in bits of the bytes object
-    if compressor == "ppm":
-        x_stream = ppm_compress_mod.compress(ppm_compress_mod.makestream(x))
-        clen = (
-            len(x_stream.getbuffer()) * 8
-        )  # to get the clen in bits from the byte stream
-    if compressor == "ppmc":
-        x = "".join(map(str, x))
-        xobj = ppmc.ppmc(x)
-        clen = xobj.compress()
-    return clen
+    specified, with its default encoding unless another is given.
+    """
+    compressor = get_compressor(compressor, encoding)
+    if compressor.bits is None:
+        raise ValueError("The length given by " + compressor.name + " is not in bits")
+    return compressor.bits(compressor.encode(x))
 
 
 def NCD_clusters(NCD_mat):
+    # scipy is only needed for clustering, so it is imported here
+    import scipy.cluster.hierarchy as hier
+
     # Get upper triangle as list
     dmat_condensed = NCD_mat[np.triu_indices(NCD_mat.shape[0], k=1)]
     # Linkage matrix
@@ -178,3 +382,4 @@ def NCD_clusters(NCD_mat):
     new_mat = NCD_mat[leaves, :]
     new_mat = new_mat[:, leaves]
     return new_mat
+
@@ -155,6 +155,84 @@ class ArithmeticEncoder(ArithmeticCoderBase):
         self.num_underflow += 1
 
 
+# Encodes symbols exactly as ArithmeticEncoder does, but without validating the frequency
+# tables or the coder state on every symbol, and collecting the output bits in an integer
+# buffer that is flushed to a bytearray a whole byte at a time instead of going through a
+# BitOutputStream bit by bit. It is meant for frequency tables that are known to be valid,
+# such as those of a PpmModel; use ArithmeticEncoder to find faults in a table.
+class FastArithmeticEncoder(ArithmeticCoderBase):
+
+    def __init__(self, numbits):
+        super(FastArithmeticEncoder, self).__init__(numbits)
+        # Number of saved underflow bits. This value can grow without bound.
+        self.num_underflow = 0
+        # Whole bytes written so far, and the bits of the partial byte after them.
+        self.output = bytearray()
+        self.bitbuffer = 0
+        self.numbitsfilled = 0
+
+    # Encodes the given symbol based on the given frequency table.
+    def write(self, freqs, symbol):
+        self.encode(freqs.get_low(symbol), freqs.get_high(symbol), freqs.get_total())
+
+    # Encodes a symbol given its cumulative frequencies: symlow is the total frequency of
+    # the symbols below it, symhigh that plus its own, out of total. This is the range
+    # update of ArithmeticCoderBase.update with the invariants it checks taken as given.
+    def encode(self, symlow, symhigh, total):
+        range = self.high - self.low + 1
+        low = self.low + symlow * range // total
+        high = self.low + symhigh * range // total - 1
+        half_range = self.half_range
+        state_mask = self.state_mask
+
+        # While low and high have the same top bit value, shift them out
+        while ((low ^ high) & half_range) == 0:
+            self._put(low >> (self.num_state_bits - 1), self.num_underflow)
+            self.num_underflow = 0
+            low = (low << 1) & state_mask
+            high = ((high << 1) & state_mask) | 1
+
+        # While low's top two bits are 01 and high's are 10, delete the second highest bit of both
+        quarter_range = self.quarter_range
+        while (low & ~high & quarter_range) != 0:
+            self.num_underflow += 1
+            low = (low << 1) ^ half_range
+            high = ((high ^ half_range) << 1) | half_range | 1
+        self.low = low
+        self.high = high
+
+    # Terminates the arithmetic coding as ArithmeticEncoder.finish does.
+    def finish(self):
+        self._put(1, 0)
+
+    # Returns the bytes written so far. As with a BitOutputStream that is not closed, the
+    # bits of a last partial byte are left out unless pad is True, in which case they are
+    # padded with 0 bits to a whole byte as BitOutputStream.close does.
+    def getvalue(self, pad=False):
+        if pad and self.numbitsfilled > 0:
+            return bytes(self.output) + bytes((self.bitbuffer << (8 - self.numbitsfilled),))
+        return bytes(self.output)
+
+    # Returns an independent copy of this encoder in its current state, so that one
+    # prefix of a message can be continued in several ways.
+    def copy(self):
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        result.output = bytearray(self.output)
+        return result
+
+    # Writes the bit followed by count copies of its complement (the saved underflow bits).
+    def _put(self, bit, count):
+        ones = (1 << count) - 1
+        self.bitbuffer = (self.bitbuffer << (count + 1)) | (bit << count) | (ones if bit == 0 else 0)
+        self.numbitsfilled += count + 1
+        if self.numbitsfilled >= 8:
+            numbytes = self.numbitsfilled >> 3
+            self.numbitsfilled &= 7
+            self.output += (self.bitbuffer >> self.numbitsfilled).to_bytes(numbytes, "big")
+            self.bitbuffer &= (1 << self.numbitsfilled) - 1
+
+
 # Reads from an arithmetic-coded bit stream and decodes symbols.
 class ArithmeticDecoder(ArithmeticCoderBase):
 
@@ -406,6 +484,14 @@ class SimpleFrequencyTable(FrequencyTable):
             self._init_cumulative()
         return self.cumulative[symbol + 1]
 
+    # Returns an independent copy of this frequency table, without re-validating it.
+    def copy(self):
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        result.frequencies = list(self.frequencies)
+        result.cumulative = None
+        return result
+
     # Recomputes the array of cumulative symbol frequencies.
     def _init_cumulative(self):
         cumul = [0]
@@ -432,6 +518,122 @@ class SimpleFrequencyTable(FrequencyTable):
         return result
 
 
+# A mutable table of symbol frequencies held in a binary indexed (Fenwick) tree, so that
+# incrementing a frequency and querying a cumulative frequency both take O(log n) time,
+# where SimpleFrequencyTable rebuilds all n cumulative frequencies after every change.
+# The number of symbols (at least 1) is given at construction time and cannot be changed.
+class FenwickFrequencyTable(FrequencyTable):
+
+    # Constructs a frequency table from a sequence of symbol frequencies or by copying
+    # another frequency table, as SimpleFrequencyTable does.
+    def __init__(self, freqs):
+        if isinstance(freqs, FrequencyTable):
+            numsym = freqs.get_symbol_limit()
+            self.frequencies = [freqs.get(i) for i in range(numsym)]
+        else:  # Assume it is a sequence type
+            self.frequencies = list(freqs)  # Make copy
+
+        if len(self.frequencies) < 1:
+            raise ValueError("At least 1 symbol needed")
+        for freq in self.frequencies:
+            if freq < 0:
+                raise ValueError("Negative frequency")
+
+        # Always equal to the sum of 'frequencies'
+        self.total = sum(self.frequencies)
+
+        # tree[i] (1-based) is the sum of 'frequencies' over the (i & -i) symbols ending at symbol i - 1.
+        # Built in linear time by pushing each partial sum up to its parent.
+        n = len(self.frequencies)
+        self.tree = [0] + self.frequencies
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                self.tree[parent] += self.tree[i]
+
+    # Returns the number of symbols in this frequency table, which is at least 1.
+    def get_symbol_limit(self):
+        return len(self.frequencies)
+
+    # Returns the frequency of the given symbol. The returned value is at least 0.
+    def get(self, symbol):
+        self._check_symbol(symbol)
+        return self.frequencies[symbol]
+
+    # Sets the frequency of the given symbol to the given value. The frequency value
+    # must be at least 0. If an exception is raised, then the state is left unchanged.
+    def set(self, symbol, freq):
+        self._check_symbol(symbol)
+        if freq < 0:
+            raise ValueError("Negative frequency")
+        self._add(symbol, freq - self.frequencies[symbol])
+
+    # Increments the frequency of the given symbol.
+    def increment(self, symbol):
+        self._check_symbol(symbol)
+        self._add(symbol, 1)
+
+    # Returns the total of all symbol frequencies. The returned value is at
+    # least 0 and is always equal to get_high(get_symbol_limit() - 1).
+    def get_total(self):
+        return self.total
+
+    # Returns the sum of the frequencies of all the symbols strictly
+    # below the given symbol value. The returned value is at least 0.
+    def get_low(self, symbol):
+        self._check_symbol(symbol)
+        return self._prefix_sum(symbol)
+
+    # Returns the sum of the frequencies of the given symbol
+    # and all the symbols below. The returned value is at least 0.
+    def get_high(self, symbol):
+        self._check_symbol(symbol)
+        return self._prefix_sum(symbol + 1)
+
+    # Returns an independent copy of this frequency table, without rebuilding the tree.
+    def copy(self):
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        result.frequencies = list(self.frequencies)
+        result.tree = list(self.tree)
+        return result
+
+    # Adds delta to the frequency of the given symbol and to the tree nodes covering it.
+    def _add(self, symbol, delta):
+        self.frequencies[symbol] += delta
+        self.total += delta
+        tree = self.tree
+        i = symbol + 1
+        n = len(tree)
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+
+    # Returns the sum of the frequencies of the first 'count' symbols.
+    def _prefix_sum(self, count):
+        tree = self.tree
+        result = 0
+        while count > 0:
+            result += tree[count]
+            count &= count - 1
+        return result
+
+    # Returns silently if 0 <= symbol < len(frequencies), otherwise raises an exception.
+    def _check_symbol(self, symbol):
+        if 0 <= symbol < len(self.frequencies):
+            return
+        else:
+            raise ValueError("Symbol out of range")
+
+    # Returns a string representation of this frequency table,
+    # useful for debugging only, and the format is subject to change.
+    def __str__(self):
+        result = ""
+        for i, freq in enumerate(self.frequencies):
+            result += "{}\t{}\n".format(i, freq)
+        return result
+
+
 # A wrapper that checks the preconditions (arguments) and postconditions (return value) of all
 # the frequency table methods. Useful for finding faults in a frequency table implementation.
 class CheckedFrequencyTable(FrequencyTable):
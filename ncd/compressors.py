@@ -0,0 +1,244 @@
+import gzip, bz2, zlib
+from functools import partial
+from complexity.ncd import ppm_compress_mod, ppmc
+from complexity.ncd.encoding import encode
+from complexity.lzc import lzc
+import numpy as np
+
+try:
+    from complexity.ppm import ppm as _native_ppm
+except OSError:
+    # the ppm extension is not built, lengths come from ppm_compress_mod
+    _native_ppm = None
+
+"""
+Registry of the compressors that NCD and clen accept. A compressor declares how a
+sequence is encoded and prepared as its input and how the compressed length of a
+prepared input is measured. The input for a concatenation xy is the concatenation
+of the prepared x and y, so each sequence only has to be prepared once.
+
+The default encoding of each compressor keeps the lengths it has always given:
+'raw' for gzip, bz2 and the lz measures, 'ascii' for snappy, ppm and ppmc.
+nlz reads the 0/1 symbols themselves, so it only accepts 'raw' and 'uint8'.
+
+A compressor whose state can be cloned may also declare how to prime it with x,
+after which C(xy) only costs compressing y. gzip does so with zlib.compressobj().copy(),
+and the lengths are exactly those of gzip.compress on the concatenation, since
+deflate makes the same choices whichever way its input is split. ppm does so with
+a copy of the model and coder of the native extension after x. bz2 and snappy
+have no way to copy a compressor, so C(xy) is still compressed from scratch.
+"""
+
+
+class Compressor:
+    """
+    A compressor for NCD.
+
+        INPUT:
+            name: key the compressor is registered under
+            prepare: function taking an encoded sequence to the compressor's input (numpy
+                     array, str or bytes, which are concatenated as such); None to use
+                     the encoded sequence as it is
+            length: function giving the compressed length of a prepared input, as used by NCD
+            bits: function giving the compressed length of a prepared input in bits, as
+                  returned by clen; None if the length is not a size in bits or bytes
+            prime: function giving the compressor's state after a prepared input x, with
+                   methods length(), the length of x, and length_with(y), the length of
+                   x followed by the prepared input y; None to compress xy from scratch
+            encoding: how a sequence is encoded before prepare, see encoding.py
+            encodings: the encodings the compressor accepts, None for all of them
+    """
+
+    def __init__(self, name, prepare, length, bits=None, prime=None, encoding="raw", encodings=None):
+        self.name = name
+        self.prepare = prepare
+        self.length = length
+        self.bits = bits
+        self.prime = prime
+        self.encoding = encoding
+        self.encodings = encodings
+
+    def encode(self, s):
+        "The compressor's input for the sequence s"
+        x = encode(s, self.encoding)
+        return x if self.prepare is None else self.prepare(x)
+
+    def with_encoding(self, encoding):
+        "The same compressor with another encoding"
+        if encoding is None or encoding == self.encoding:
+            return self
+        if self.encodings is not None and encoding not in self.encodings:
+            raise ValueError("The " + self.name + " compressor does not accept the " + str(encoding) + " encoding")
+        return Compressor(self.name, self.prepare, self.length, self.bits, self.prime, encoding, self.encodings)
+
+    def start(self, x):
+        "State after the prepared input x, from which C(x) and C(xy) are measured"
+        if self.prime is not None:
+            return self.prime(x)
+        return _FromScratch(self, x)
+
+    def concat(self, x, y):
+        "Prepared input of the concatenation of two prepared inputs"
+        if isinstance(x, (str, bytes)):
+            return x + y
+        return np.concatenate((x, y))
+
+
+class _FromScratch:
+    "State of a compressor that cannot be primed, every length is compressed in full"
+
+    def __init__(self, compressor, x):
+        self.compressor = compressor
+        self.x = x
+
+    def length(self):
+        return self.compressor.length(self.x)
+
+    def length_with(self, y):
+        return self.compressor.length(self.compressor.concat(self.x, y))
+
+
+class _GzipState:
+    """
+    A deflate stream after x. The raw deflate output plus the 10 byte header and
+    8 byte trailer is what gzip.compress gives at the same level.
+    """
+
+    def __init__(self, x, level=9):
+        self.stream = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.emitted = 18 + len(self.stream.compress(x))
+
+    def length(self):
+        return self.emitted + len(self.stream.copy().flush())
+
+    def length_with(self, y):
+        stream = self.stream.copy()
+        return self.emitted + len(stream.compress(y)) + len(stream.flush())
+
+
+class _PpmState:
+    "The PPM model and coder after x, in the native extension, copied for every continuation"
+
+    def __init__(self, x):
+        self.prefix = _native_ppm.PpmPrefix(x, ppm_compress_mod.MODEL_ORDER)
+
+    def length(self):
+        return self.prefix.length()
+
+    def length_with(self, y):
+        return self.prefix.length_with(y)
+
+
+class _LZState:
+    "A Kaspar-Schuster parse of x, forked for every continuation"
+
+    def __init__(self, x):
+        self.parser = lzc.LZParser(x)
+
+    def length(self):
+        return self.parser.complexity()
+
+    def length_with(self, y):
+        return self.parser.fork().extend(y).complexity()
+
+
+_registry = {}
+
+
+def register_compressor(name, prepare, length, bits=None, prime=None, encoding="raw", encodings=None):
+    """
+    Registers a compressor so that NCD, NCD_pairwise and clen accept it by name.
+    A module with that __name__ (as gzip or bz2) is accepted too.
+
+        INPUT: see Compressor
+
+        OUTPUT: the registered Compressor
+    """
+    compressor = Compressor(name, prepare, length, bits, prime, encoding, encodings)
+    _registry[name] = compressor
+    return compressor
+
+
+def get_compressor(compressor, encoding=None):
+    """
+    Looks up a registered compressor from its name or module. A Compressor is
+    returned as it is. If an encoding is given it replaces the compressor's own.
+    """
+    if not isinstance(compressor, Compressor):
+        name = compressor if isinstance(compressor, str) else getattr(compressor, "__name__", None)
+        if name not in _registry:
+            raise ValueError("Unknown compressor: " + str(compressor))
+        compressor = _registry[name]
+    return compressor.with_encoding(encoding)
+
+
+def _snappy():
+    "Imports snappy on first use"
+    try:
+        import snappy
+    except ImportError:
+        raise ImportError("the snappy compressor requires python-snappy (pip install python-snappy)")
+    return snappy
+
+
+def _padded(x):
+    return x * 3 if isinstance(x, bytes) else np.tile(x, 3)
+
+
+def _bits_from_bytes(length, x):
+    return length(x) * 8
+
+
+def _byte_bits(length):
+    "clen in bits from a length in bytes, picklable so that the Compressor can be sent to worker processes"
+    return partial(_bits_from_bytes, length)
+
+
+def _gzip_length(x):
+    return len(gzip.compress(x))
+
+
+def _bz2_length(x):
+    return len(bz2.compress(x))
+
+
+def _snappy_length(x):
+    return len(_snappy().compress(x))
+
+
+def _ppm_length(x):
+    if _native_ppm is not None and len(x) <= _native_ppm.MAX_LENGTH:
+        return _native_ppm.ppm_compressed_length(x, ppm_compress_mod.MODEL_ORDER)
+    return ppm_compress_mod.compressed_length(x)
+
+
+def _ppmc_bits(x):
+    # ppmc reads its input as a string, one character per symbol
+    return ppmc.ppmc(bytes(x).decode("latin-1")).compress()
+
+
+def _ppmc_length(x):
+    return round(_ppmc_bits(x))
+
+
+def _nlz_length(s):
+    # lz complexity normalised by that expected of a random sequence of the same entropy;
+    # s holds the 0/1 symbols themselves, as the raw and uint8 encodings keep them
+    t = len(s)
+    p = float(np.sum(s, dtype=np.int64)) / t
+    h = -p * np.log2(p) - (1 - p) * np.log2(1 - p)
+    c_st = h * t / np.log2(t)
+    return lzc.lz_complexity(s) / c_st
+
+
+register_compressor("gzip", None, _gzip_length, _byte_bits(_gzip_length), _GzipState)
+register_compressor("bz2", None, _bz2_length, _byte_bits(_bz2_length))
+register_compressor("gzip_padded", _padded, _gzip_length, _byte_bits(_gzip_length), _GzipState)
+register_compressor("snappy", None, _snappy_length, _byte_bits(_snappy_length), encoding="ascii")
+# without the native extension, compressing xy from scratch with compressed_length is
+# about as fast as continuing a ppm_compress_mod.PpmStream snapshot with y
+_ppm_prime = None if _native_ppm is None else _PpmState
+register_compressor("ppm", None, _ppm_length, _byte_bits(_ppm_length), _ppm_prime, encoding="ascii")
+register_compressor("ppmc", None, _ppmc_length, _ppmc_bits, encoding="ascii")
+register_compressor("lz", None, lzc.lz_complexity, prime=_LZState)
+register_compressor("nlz", None, _nlz_length, encodings=("raw", "uint8"))
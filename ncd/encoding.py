@@ -0,0 +1,44 @@
+import numpy as np
+
+"""
+Encodings of a sequence of symbols as the input of a compressor. Compressors work on
+bytes, and how a sequence is laid out in them changes both the compressed lengths
+and the time taken to compress, so each compressor in the registry has a default
+encoding which any call can override.
+
+    'raw' : the array's own memory, e.g. 8 bytes per symbol for int64 arrays
+    'uint8' : one byte per symbol, for symbols 0..255
+    'packbits' : eight binary symbols per byte, the last byte padded with zeros;
+                 a concatenation is then that of whole bytes
+    'ascii' : the symbols written out in decimal, as "".join(map(str, s)) gives, as bytes
+"""
+
+ENCODINGS = ("raw", "uint8", "packbits", "ascii")
+
+
+def encode(s, encoding):
+    """
+    Encodes a sequence for a compressor.
+
+        INPUT: s, numpy array or list of symbols; encoding, one of ENCODINGS
+
+        OUTPUT: numpy array for 'raw', numpy uint8 array for 'uint8' and 'packbits',
+                bytes for 'ascii'
+    """
+    s = np.asarray(s)
+    if encoding == "raw":
+        return np.ascontiguousarray(s)
+    elif encoding == "uint8":
+        if s.size and (s.min() < 0 or s.max() > 255):
+            raise ValueError("the uint8 encoding needs symbols in 0..255")
+        return s.astype(np.uint8)
+    elif encoding == "packbits":
+        if s.size and (s.min() < 0 or s.max() > 1):
+            raise ValueError("the packbits encoding needs binary symbols")
+        return np.packbits(s.astype(bool))
+    elif encoding == "ascii":
+        if s.dtype.kind in "iu" and (s.size == 0 or (s.min() >= 0 and s.max() <= 9)):
+            # single digits, one byte each
+            return (s.astype(np.uint8) + ord("0")).tobytes()
+        return "".join(map(str, s)).encode("ascii")
+    raise ValueError("Unknown encoding: " + str(encoding))
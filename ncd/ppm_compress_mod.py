@@ -50,15 +50,24 @@ def makestream(a):
     return byte_stream
 
 
-def compress(inp):
+def compress(inp, checked=False):
+    """
+    Compresses the byte stream inp and returns the compressed bytes in a new stream.
+    With checked=True every frequency table and coder state is validated by
+    ArithmeticEncoder as it goes; otherwise the unchecked FastArithmeticEncoder
+    writes the same bytes.
+    """
     outputstream = io.BytesIO()
-    # From original main function, writes bits to another byte stream
-    bitout = arithmeticcoding.BitOutputStream(outputstream)
 
     # Set up encoder and model. In this PPM model, symbol 256 represents EOF;
     # its frequency is 1 in the order -1 context but its frequency
     # is 0 in all other contexts (which have non-negative order).
-    enc = arithmeticcoding.ArithmeticEncoder(32, bitout)
+    if checked:
+        # From original main function, writes bits to another byte stream
+        bitout = arithmeticcoding.BitOutputStream(outputstream)
+        enc = arithmeticcoding.ArithmeticEncoder(32, bitout)
+    else:
+        enc = arithmeticcoding.FastArithmeticEncoder(32)
     model = ppmmodel.PpmModel(MODEL_ORDER, 257, 256)
     history = []
 
@@ -79,9 +88,128 @@ def compress(inp):
 
     encode_symbol(model, history, 256, enc)  # EOF
     enc.finish()  # Flush remaining code bits
+    if not checked:
+        outputstream.write(enc.getvalue())
     return outputstream
 
 
+def compressed_length(buf, order=MODEL_ORDER):
+    """
+    Number of bytes that compress() writes for the bytes in buf, without writing any.
+    The same model, held as a CompactPpmModel, drives a copy of the arithmetic coder
+    that only counts the bits it would emit, so the result is exactly
+    len(compress(stream).getbuffer()).
+
+    INPUT:
+        buf: bytes, memoryview or numpy array, whose memory is read in place as the
+             sequence of byte symbols
+        order: context order of the PPM model
+
+    OUTPUT:
+        number of bytes of compressed output
+    """
+    if isinstance(buf, np.ndarray):
+        buf = np.ascontiguousarray(buf)
+    data = memoryview(buf).cast("B")
+    enc = _BitCounter(32)
+    # the model only needs to hold the symbols that occur
+    model = ppmmodel.CompactPpmModel(order, set(data))
+    index = model.index
+    history = []
+
+    for byte in data:
+        symbol = index[byte]
+        _encode_compact(model, history, symbol, byte, enc)
+        model.increment_contexts(history, symbol)
+
+        if model.model_order >= 1:
+            # Prepend current symbol, dropping oldest symbol if necessary
+            if len(history) == model.model_order:
+                history.pop()
+            history.insert(0, symbol)
+
+    _encode_compact(model, history, model.escape_symbol, 256, enc)  # EOF
+    enc.finish()
+    # the bit stream is never closed, so a last partial byte is not written
+    return enc.num_bits // 8
+
+
+def _encode_compact(model, history, symbol, byte, enc):
+    "encode_symbol for a CompactPpmModel, symbol is the index of byte in its alphabet"
+    escape = model.escape_symbol
+    for order in reversed(range(len(history) + 1)):
+        ctx = model.context(history, order)
+        if ctx < 0:
+            continue
+        low, high, total = model.frequency_range(ctx, symbol)
+        if symbol != escape and high > low:
+            enc.encode(low, high, total)
+            return
+        # Else write context escape symbol and continue decrementing the order
+        enc.encode(*model.frequency_range(ctx, escape))
+    # Logic for order = -1, a flat table over all 257 symbols
+    enc.encode(byte, byte + 1, 257)
+
+
+class PpmStream(object):
+    """
+    The PPM model and arithmetic coder of compress() part way through a sequence of
+    bytes. A snapshot continues from the same point without the bytes before it
+    being modelled again, and the model's contexts are only copied as the snapshot
+    changes them, so one prefix x can be continued with many y.
+
+    INPUT:
+        order: context order of the PPM model
+    """
+
+    def __init__(self, order=MODEL_ORDER):
+        self.model = ppmmodel.PpmModel(order, 257, 256)
+        self.history = []
+        self.enc = _BitCounter(32)
+
+    def feed(self, buf):
+        "Codes the bytes in buf, read as compressed_length reads them, and returns self"
+        if isinstance(buf, np.ndarray):
+            buf = np.ascontiguousarray(buf)
+        model, history, enc = self.model, self.history, self.enc
+        for symbol in memoryview(buf).cast("B"):
+            encode_symbol(model, history, symbol, enc)
+            model.increment_contexts(history, symbol)
+
+            if model.model_order >= 1:
+                # Prepend current symbol, dropping oldest symbol if necessary
+                if len(history) == model.model_order:
+                    history.pop()
+                history.insert(0, symbol)
+        return self
+
+    def snapshot(self):
+        "A copy of this stream that can be fed independently"
+        result = object.__new__(type(self))
+        result.model = self.model.snapshot()
+        result.history = list(self.history)
+        result.enc = self.enc.copy()
+        return result
+
+    def length(self):
+        "Number of bytes compress() writes for the bytes fed so far"
+        enc = self.enc.copy()
+        encode_symbol(self.model, self.history, 256, enc)  # EOF
+        enc.finish()
+        return enc.num_bits // 8
+
+
+class _BitCounter(arithmeticcoding.FastArithmeticEncoder):
+    "FastArithmeticEncoder that only counts the bits it would write"
+
+    def __init__(self, numbits):
+        super(_BitCounter, self).__init__(numbits)
+        self.num_bits = 0
+
+    def _put(self, bit, count):
+        self.num_bits += count + 1
+
+
 def encode_symbol(model, history, symbol, enc):
     # Try to use highest order context that exists based on the history suffix, such
     # that the next symbol has non-zero frequency. When symbol 256 is produced at a context
@@ -15,67 +15,289 @@ has been heavily modified. The most significant changes are described below.
     - The script has been made functional in python 3.
     - The "impossible" table (whatever that is) has been initiated in the predict
       function to fix a bug.
+    - Contexts are integers and escapes are a loop rather than a recursion, with the
+      totals kept next to the counts, so a prediction copies nothing. The lengths are
+      those of the recursive version, which excluded no symbols; exclusion=True
+      gives proper PPMC symbol exclusion. Without exclusion, compress() gets every
+      prediction of a new sequence from counts over the whole of it at once.
 """
 
 
+# Bits of the order -1 prediction, where every one of the 256 characters has a
+# count of 1. The table is the same for every sequence, so it is only kept as
+# its size and is never copied or filled per instance.
+ORDER_MINUS_ONE_SIZE = 2**8
+_ORDER_MINUS_ONE_BITS = -math.log(float(1) / float(ORDER_MINUS_ONE_SIZE), 2)
+
+
 class ppmc:
+    """
+    PPMC code length of a string of characters 0..255.
+
+        INPUT: arr, string to compress
+               order, the highest context order k
+               exclusion, if True, the symbols of a context that was escaped from
+                          are left out of the lower order predictions (symbol
+                          exclusion); the default keeps the lengths this class has
+                          always given, which predict without exclusion
+    """
 
-    def __init__(self, arr):
+    def __init__(self, arr, exclusion=False, order=3):
         self.arr = arr
         self.bits = list()
-        self.k = 3
-        # If the table is a private member variable, it might change between class instances
-        self.table = [dict() for i in range(self.k + 2)]  # {-1, ..., k}
-        # -1 table, default ctx is ''
-        self.table[0][""] = dict()
-        # Instead of putting the whole ascii table in the -1 order context which would
-        # be needed for text compression
-        # self.table[0]['']['1'] = 1
-        # self.table[0]['']['0'] = 1
-        for i in range(2**8):
-            self.table[0][""][chr(i)] = 1
-
-    def predict(self, c, ctx, s, impossible=None):
-        if impossible == None:
-            impossible = []
-        if ctx in self.table[s + 1]:
-            cp = self.table[s + 1][ctx].copy()
-            for key in impossible:
-                if key in cp:
-                    cp.pop(key)
-            distinct = 0 if s == -1 else len(cp.keys())
-            csum = sum(cp.values())
-            if c in cp:
-                prob = float(cp[c]) / float(distinct + csum)
-                self.bits.append(-math.log(prob, 2))
-                # print(output % ("' '" if c == ' ' else c, prob))
+        self.k = order
+        self.exclusion = exclusion
+        # contexts[s] maps an order s context, its characters packed one byte each
+        # with the most recent lowest, to [total of its counts, {character: count}, owner];
+        # the number of distinct characters (the escape count) is the dict's size.
+        # A context is shared with snapshots until one of them counts in it, and
+        # belongs to the model whose owner token it carries.
+        self.contexts = [dict() for i in range(self.k + 1)]  # {0, ..., k}
+        self.owner = object()
+        # number of characters coded, and the last k of them packed as a context
+        self.position = 0
+        self.history = 0
+        # -math.log(num / den, 2) for each probability met so far, keyed by den**2 + num
+        self._log_cache = dict()
+
+    def _log_bits(self, num, den):
+        key = den * den + num
+        bits = self._log_cache.get(key)
+        if bits is None:
+            bits = -math.log(float(num) / float(den), 2)
+            self._log_cache[key] = bits
+        return bits
+
+    def code(self, c, history, n):
+        """
+        Adds the bits of character c after the last n characters, packed in history,
+        and counts c in the contexts of the last 0 .. n characters. The prediction
+        escapes from order n down to the first context that has seen c, and every
+        context on the way is counted as it is passed.
+        """
+        log_cache = self._log_cache
+        owner = self.owner
+        excluded = set() if self.exclusion else None
+        found = False
+        for s in range(n, -1, -1):
+            table = self.contexts[s]
+            key = history & ((1 << (8 * s)) - 1)
+            ctx = table.get(key)
+            if ctx is None:
+                table[key] = [1, {c: 1}, owner]
+                continue
+            if ctx[2] is not owner:
+                ctx = table[key] = [ctx[0], dict(ctx[1]), owner]
+            csum, cp, _ = ctx
+            ctx[0] = csum + 1
+            count = cp.get(c)
+            if found:
+                cp[c] = 1 if count is None else count + 1
+                continue
+            distinct = len(cp)
+            if excluded:
+                for sym in excluded:
+                    if sym in cp:
+                        csum -= cp[sym]
+                        distinct -= 1
+            if count is not None:
+                num = count
+                cp[c] = count + 1
+                found = True
+            else:
+                if csum == 0:
+                    # every character here was excluded, so there is nothing to escape from
+                    cp[c] = 1
+                    continue
+                if excluded is not None:
+                    excluded.update(cp)
+                num = distinct
+                cp[c] = 1
+            den = distinct + csum
+            bits = log_cache.get(den * den + num)
+            if bits is None:
+                bits = self._log_bits(num, den)
+            self.bits.append(bits)
+        if not found:
+            if excluded:
+                self.bits.append(self._log_bits(1, ORDER_MINUS_ONE_SIZE - len(excluded)))
             else:
-                if csum > 0:
-                    prob = float(distinct) / float(distinct + csum)
-                    self.bits.append(-math.log(prob, 2))
-                    # print(output % (escape, prob))
-                self.predict(c, ctx[1:], s - 1, impossible.append(cp.keys()))
-        else:
-            self.predict(c, ctx[1:], s - 1, impossible)
-
-    def update(self, c, ctx):
-        for i in range(0, len(ctx) + 1):
-            pre = ctx[i:]
-            s = len(pre)
-            if pre not in self.table[s + 1]:
-                self.table[s + 1][pre] = dict()
-            if c not in self.table[s + 1][pre]:
-                self.table[s + 1][pre][c] = 0
-            self.table[s + 1][pre][c] += 1
+                self.bits.append(_ORDER_MINUS_ONE_BITS)
+
+    def feed(self, arr):
+        """
+        Codes the string (or bytes) arr after the characters coded so far, and
+        returns self; sum(self.bits) is then the length of everything fed
+        """
+        if self.position > 0 and not self.contexts[0]:
+            raise ValueError("compress() kept no model to continue from")
+        # characters above 255 have no order -1 probability
+        data = arr.encode("latin-1") if isinstance(arr, str) else bytes(arr)
+        k = self.k
+        mask = (1 << (8 * k)) - 1
+        code = self.code
+        history, position = self.history, self.position
+        for c in data:
+            code(c, history, position if position < k else k)
+            history = ((history << 8) | c) & mask
+            position += 1
+        self.history, self.position = history, position
+        return self
+
+    def snapshot(self):
+        """
+        A model that continues from the characters coded so far, as feed() would,
+        while this one stays as it is. The contexts are shared and copied by
+        whichever model first counts in them, so a snapshot costs a copy of the
+        context tables and the bits rather than of every count.
+        """
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        result.bits = list(self.bits)
+        result.contexts = [table.copy() for table in self.contexts]
+        # the shared contexts now belong to neither model
+        self.owner = object()
+        result.owner = object()
+        return result
 
     def compress(self):
-        for i in range(len(self.arr)):
-            c = self.arr[i]
-            start = i - self.k if i > self.k else 0
-            context = self.arr[start:i]
-            self.predict(c, context, len(context), impossible=None)
-            self.update(c, context)
-        return sum(self.bits)
+        if not self.exclusion and self.position == 0:
+            # nothing coded yet, so every count is known from the sequence alone;
+            # no model is kept to continue from
+            data = self.arr.encode("latin-1") if isinstance(self.arr, str) else bytes(self.arr)
+            rows = np.frombuffer(data, dtype=np.uint8)[None, :]
+            self.bits.extend(_prediction_bits(rows, self.k, self._log_bits)[0])
+            self.position = len(data)
+            return sum(self.bits)
+        return sum(self.feed(self.arr).bits)
+
+
+def ppmc_lengths(arr2d, order=3, pairs=None, chunk_size=2**20):
+    """
+    PPMC code length in bits of every row of a 2-D array, as ppmc(row).compress()
+    gives for the string with one character per element, computed for all rows
+    at once. Rows of the digits 0..9 thus have the lengths of their 'ascii'
+    encoding, as used by the 'ppmc' compressor in NCD and clen.
+
+        INPUT: arr2d, 2-D numpy int array with values 0..255, one sequence per row
+               order, the highest context order k
+               pairs, optional (i, j) index pairs or a 2 column array of them, for
+                      which the length of row i followed by row j is also found
+               chunk_size, about how many elements are modelled together
+
+        OUTPUT: lengths, numpy float array of the length of each row; with pairs,
+                (lengths, pair_lengths) where pair_lengths has the length of each
+                concatenation
+    """
+    arr2d = np.asarray(arr2d)
+    if arr2d.ndim != 2:
+        raise ValueError("arr2d must be a 2-D array")
+    if arr2d.dtype.kind not in "biu":
+        raise ValueError("arr2d must hold integers")
+    if arr2d.size and (arr2d.min() < 0 or arr2d.max() >= ORDER_MINUS_ONE_SIZE):
+        raise ValueError("ppmc symbols must be in 0..255")
+    cache = dict()
+
+    def log_bits(num, den):
+        key = den * den + num
+        bits = cache.get(key)
+        if bits is None:
+            bits = -math.log(float(num) / float(den), 2)
+            cache[key] = bits
+        return bits
+
+    def lengths(rows):
+        out = np.zeros(len(rows))
+        step = max(1, chunk_size // max(rows.shape[1], 1))
+        for r in range(0, len(rows), step):
+            for i, bits in enumerate(_prediction_bits(rows[r : r + step], order, log_bits)):
+                out[r + i] = sum(bits)
+        return out
+
+    rows = arr2d.astype(np.uint8)
+    C = lengths(rows)
+    if pairs is None:
+        return C
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    C_pairs = np.zeros(len(pairs))
+    step = max(1, chunk_size // max(2 * rows.shape[1], 1))
+    for p in range(0, len(pairs), step):
+        i, j = pairs[p : p + step, 0], pairs[p : p + step, 1]
+        C_pairs[p : p + step] = lengths(np.concatenate((rows[i], rows[j]), axis=1))
+    return C, C_pairs
+
+
+def _group_ranks(keys):
+    "For each element, the number of earlier elements with the same key, and the sort by key"
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.ones(len(keys), dtype=bool)
+    starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    index = np.arange(len(keys))
+    first = np.maximum.accumulate(np.where(starts, index, 0))
+    ranks = np.empty(len(keys), dtype=np.int64)
+    ranks[order] = index - first
+    return ranks, order, first
+
+
+def _prediction_bits(rows, k, log_bits):
+    """
+    Bits of every prediction ppmc.code makes without exclusion on each row of a
+    2-D array of characters 0..255, in the order it makes them, found from counts
+    over the whole rows rather than by coding one character at a time.
+
+    The order s context of position i (i >= s) holds the characters that followed
+    its earlier occurrences: its total is the number of those, the count of c the
+    number followed by c, and the escape count the number of distinct characters,
+    which is the number of those occurrences that were the first followed by theirs.
+
+        OUTPUT: list of the lists of bits of the rows
+    """
+    R, n = rows.shape
+    if n == 0:
+        return [[] for r in range(R)]
+    c = rows.astype(np.int64).ravel()
+    pos = np.tile(np.arange(n), R)
+    # ids[i], a number for the order s context of i, the same for the same row and
+    # characters; -1 before position s
+    ids = np.repeat(np.arange(R, dtype=np.int64), n)
+    # columns k .. 0 are the orders in the order they are tried, then order -1
+    num = np.zeros((R * n, k + 2), dtype=np.int64)
+    den = np.zeros((R * n, k + 2), dtype=np.int64)
+    found = np.zeros((R * n, k + 2), dtype=bool)
+    for s in range(min(k, n - 1) + 1):
+        col = k - s
+        if s > 0:
+            valid = pos >= s
+            prev = np.full(R * n, -1, dtype=np.int64)
+            prev[s:] = c[:-s]
+            ids = np.where(valid, ids * 256 + prev, -1)
+            ids[valid] = np.unique(ids[valid], return_inverse=True)[1].ravel()
+        at = np.flatnonzero(ids >= 0)
+        keys = ids[at]
+        total, order, first = _group_ranks(keys)
+        count, _, _ = _group_ranks(keys * 256 + c[at])
+        # number of earlier first occurrences in the same context
+        new = (count == 0)[order].astype(np.int64)
+        seen = np.cumsum(new) - new
+        distinct = np.empty(len(keys), dtype=np.int64)
+        distinct[order] = seen - seen[first]
+        num[at, col] = np.where(count > 0, count, distinct)
+        den[at, col] = distinct + total
+        found[at, col] = count > 0
+    # the search stops at the first context that has seen the character
+    stop = np.where(found.any(axis=1), found.argmax(axis=1), k + 1)
+    num[:, k + 1] = 1
+    den[:, k + 1] = ORDER_MINUS_ONE_SIZE
+    emitted = (den > 0) & (np.arange(k + 2) <= stop[:, None])
+    # a context that has not been seen yet codes nothing
+    emitted[:, k + 1] = stop == k + 1
+    ends = np.cumsum(emitted.reshape(R, n * (k + 2)).sum(axis=1)).tolist()
+    num, den = num[emitted], den[emitted]
+    _, index, inverse = np.unique(den * den + num, return_index=True, return_inverse=True)
+    values = [log_bits(a, b) for a, b in zip(num[index].tolist(), den[index].tolist())]
+    bits = np.array(values)[inverse.ravel()].tolist()
+    return [bits[a:b] for a, b in zip([0] + ends[:-1], ends)]
 
 
 if __name__ == "__main__":
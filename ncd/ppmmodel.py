@@ -7,19 +7,31 @@
 #
 
 from complexity.ncd import arithmeticcoding
+from array import array
 
 
 class PpmModel(object):
 
-    def __init__(self, order, symbollimit, escapesymbol):
+    # frequencytable is the FrequencyTable class that holds each context's frequencies
+    def __init__(
+        self,
+        order,
+        symbollimit,
+        escapesymbol,
+        frequencytable=arithmeticcoding.FenwickFrequencyTable,
+    ):
         if order < -1 or symbollimit <= 0 or not (0 <= escapesymbol < symbollimit):
             raise ValueError()
         self.model_order = order
         self.symbol_limit = symbollimit
         self.escape_symbol = escapesymbol
+        self.frequency_table = frequencytable
+        # Contexts are shared with snapshots of this model until one of them writes
+        # to them; a context belongs to the model whose owner token it carries.
+        self.owner = object()
 
         if order >= 0:
-            self.root_context = PpmModel.Context(symbollimit, order >= 1)
+            self.root_context = PpmModel.Context(symbollimit, order >= 1, frequencytable, self.owner)
             self.root_context.frequencies.increment(escapesymbol)
         else:
             self.root_context = None
@@ -31,7 +43,10 @@ class PpmModel(object):
         if len(history) > self.model_order or not (0 <= symbol < self.symbol_limit):
             raise ValueError()
 
+        owner = self.owner
         ctx = self.root_context
+        if ctx.owner is not owner:
+            ctx = self.root_context = ctx.copy(owner)
         ctx.frequencies.increment(symbol)
         for i, sym in enumerate(history):
             subctxs = ctx.subcontexts
@@ -39,15 +54,110 @@ class PpmModel(object):
 
             if subctxs[sym] is None:
                 subctxs[sym] = PpmModel.Context(
-                    self.symbol_limit, i + 1 < self.model_order
+                    self.symbol_limit, i + 1 < self.model_order, self.frequency_table, owner
                 )
                 subctxs[sym].frequencies.increment(self.escape_symbol)
+            elif subctxs[sym].owner is not owner:
+                # copy the path down to the contexts this model writes to
+                subctxs[sym] = subctxs[sym].copy(owner)
             ctx = subctxs[sym]
             ctx.frequencies.increment(symbol)
 
+    def snapshot(self):
+        """
+        Returns a model with the same frequencies, in constant time. The two share
+        their contexts, and either one copies a context before it first changes it,
+        so neither sees the other's updates.
+        """
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        # the shared contexts now belong to neither model
+        self.owner = object()
+        result.owner = object()
+        return result
+
     # Helper structure
     class Context(object):
 
-        def __init__(self, symbols, hassubctx):
-            self.frequencies = arithmeticcoding.SimpleFrequencyTable([0] * symbols)
+        def __init__(
+            self,
+            symbols,
+            hassubctx,
+            frequencytable=arithmeticcoding.FenwickFrequencyTable,
+            owner=None,
+        ):
+            self.frequencies = frequencytable([0] * symbols)
             self.subcontexts = ([None] * symbols) if hassubctx else None
+            self.owner = owner
+
+        # A copy of this context for the model with the given owner token, sharing its subcontexts
+        def copy(self, owner):
+            result = object.__new__(type(self))
+            result.frequencies = self.frequencies.copy()
+            result.subcontexts = None if self.subcontexts is None else list(self.subcontexts)
+            result.owner = owner
+            return result
+
+
+class CompactPpmModel(object):
+    """
+    The frequencies of a PpmModel over a known alphabet, kept in flat arrays indexed
+    by context id instead of a tree of 257 entry tables. Symbols are numbered by
+    their rank in the sorted alphabet and the escape symbol comes last, so a symbol's
+    cumulative frequency in a context is the one PpmModel gives it: the symbols
+    outside the alphabet, which have zero frequency, are simply not stored.
+    """
+
+    def __init__(self, order, alphabet):
+        if order < -1:
+            raise ValueError()
+        self.model_order = order
+        self.alphabet = sorted(alphabet)
+        self.index = {sym: i for i, sym in enumerate(self.alphabet)}
+        self.symbol_limit = len(self.alphabet) + 1
+        self.escape_symbol = len(self.alphabet)
+        # counts[ctx * symbol_limit + i] is the frequency of symbol i in context ctx,
+        # children[ctx * symbol_limit + i] the context below it after symbol i, or -1
+        self.counts = array("q")
+        self.totals = array("q")
+        self.children = array("q")
+        self.root_context = self._new_context() if order >= 0 else -1
+
+    def _new_context(self):
+        ctx = len(self.totals)
+        self.counts.extend([0] * self.symbol_limit)
+        self.children.extend([-1] * self.symbol_limit)
+        self.counts[ctx * self.symbol_limit + self.escape_symbol] = 1
+        self.totals.append(1)
+        return ctx
+
+    def context(self, history, order):
+        "Context of the first order symbols of history (by index), or -1 if it was never seen"
+        ctx = self.root_context
+        for sym in history[:order]:
+            ctx = self.children[ctx * self.symbol_limit + sym]
+            if ctx < 0:
+                break
+        return ctx
+
+    def frequency_range(self, ctx, symbol):
+        "low, high and total of a symbol (by index) in a context, as a FrequencyTable gives"
+        base = ctx * self.symbol_limit
+        low = sum(self.counts[base : base + symbol])
+        return low, low + self.counts[base + symbol], self.totals[ctx]
+
+    def increment_contexts(self, history, symbol):
+        if self.model_order == -1:
+            return
+        K = self.symbol_limit
+        ctx = self.root_context
+        self.counts[ctx * K + symbol] += 1
+        self.totals[ctx] += 1
+        for sym in history:
+            child = self.children[ctx * K + sym]
+            if child < 0:
+                child = self._new_context()
+                self.children[ctx * K + sym] = child
+            ctx = child
+            self.counts[ctx * K + symbol] += 1
+            self.totals[ctx] += 1
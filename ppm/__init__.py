@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Native PPM compressed lengths, see ppm.py
+"""
@@ -0,0 +1,457 @@
+/*
+Compressed length of a byte sequence under the PPM compressor of ncd/ppm_compress_mod.py:
+an order-k PPM model over the 256 byte values, with symbol 256 as both the escape and
+the end of data, coded by the 32 bit arithmetic coder of ncd/arithmeticcoding.py.
+Only the number of bits the coder emits is counted, and the byte count is that of the
+unclosed BitOutputStream of compress(), so the lengths match it exactly.
+
+The model is that of CompactPpmModel: each context is a row of counts over the bytes
+that occur in the input plus the escape, in that order, which gives every symbol the
+cumulative frequency it has among all 257. Counts are 32 bit, so the input must be
+shorter than 2^30 bytes, the largest total the coder accepts.
+*/
+#include <stdlib.h>
+#include <string.h>
+#include "ppm.h"
+#include "../lzc/lzc_parallel.h"
+
+/*
+Arithmetic coder with 32 state bits that counts the bits it would write
+*/
+#define PPM_STATE_BITS 32
+#define PPM_HALF_RANGE ((uint64_t)1 << (PPM_STATE_BITS - 1))
+#define PPM_QUARTER_RANGE (PPM_HALF_RANGE >> 1)
+#define PPM_STATE_MASK (((uint64_t)1 << PPM_STATE_BITS) - 1)
+
+typedef struct
+{
+  uint64_t low;
+  uint64_t high;
+  int64_t num_underflow;
+  int64_t num_bits;
+} ppm_coder;
+
+static void ppm_encode(ppm_coder *c, uint64_t symlow, uint64_t symhigh, uint64_t total)
+{
+  uint64_t range = c->high - c->low + 1;
+  uint64_t low = c->low + symlow*range/total;
+  uint64_t high = c->low + symhigh*range/total - 1;
+
+  // While low and high have the same top bit value, shift them out
+  while (((low ^ high) & PPM_HALF_RANGE) == 0)
+  {
+    c->num_bits += 1 + c->num_underflow;
+    c->num_underflow = 0;
+    low = (low << 1) & PPM_STATE_MASK;
+    high = ((high << 1) & PPM_STATE_MASK) | 1;
+  }
+  // While low's top two bits are 01 and high's are 10, delete the second highest bit of both
+  while ((low & ~high & PPM_QUARTER_RANGE) != 0)
+  {
+    c->num_underflow++;
+    low = (low << 1) ^ PPM_HALF_RANGE;
+    high = ((high ^ PPM_HALF_RANGE) << 1) | PPM_HALF_RANGE | 1;
+  }
+  c->low = low;
+  c->high = high;
+}
+
+/*
+Context store: counts[ctx*K + i] and children[ctx*K + i] for the K symbols
+(the bytes of the alphabet, in increasing order, then the escape), totals[ctx].
+index[b] is the symbol of byte b, or -1 if b is not in the alphabet.
+*/
+typedef struct
+{
+  int K;
+  int index[256];
+  int64_t num;
+  int64_t cap;
+  uint32_t *counts;
+  int32_t *children;
+  uint64_t *totals;
+} ppm_model;
+
+/*
+A model and coder part way through a sequence: history holds the last depth
+bytes, most recent first
+*/
+typedef struct
+{
+  int order;
+  int depth;
+  uint8_t *history;
+  int64_t *chain;
+  ppm_model m;
+  ppm_coder c;
+} ppm_stream;
+
+static int ppm_reserve(ppm_model *m, int64_t cap)
+{
+  int K = m->K;
+  uint32_t *counts;
+  int32_t *children;
+  uint64_t *totals;
+
+  if (cap <= m->cap)
+    return 0;
+  counts = (uint32_t *)realloc(m->counts, cap*K*sizeof(uint32_t));
+  if (counts == NULL)
+    return -1;
+  m->counts = counts;
+  children = (int32_t *)realloc(m->children, cap*K*sizeof(int32_t));
+  if (children == NULL)
+    return -1;
+  m->children = children;
+  totals = (uint64_t *)realloc(m->totals, cap*sizeof(uint64_t));
+  if (totals == NULL)
+    return -1;
+  m->totals = totals;
+  m->cap = cap;
+  return 0;
+}
+
+static int64_t ppm_new_context(ppm_model *m)
+{
+  int64_t ctx = m->num;
+  int K = m->K;
+
+  if (m->num == m->cap && ppm_reserve(m, m->cap ? 2*m->cap : 64) < 0)
+    return -1;
+  memset(m->counts + ctx*K, 0, K*sizeof(uint32_t));
+  memset(m->children + ctx*K, 0xff, K*sizeof(int32_t));
+  m->counts[ctx*K + K - 1] = 1;
+  m->totals[ctx] = 1;
+  m->num++;
+  return ctx;
+}
+
+static void ppm_free_model(ppm_model *m)
+{
+  free(m->counts);
+  free(m->children);
+  free(m->totals);
+}
+
+// Numbers the bytes flagged in present in increasing order, the escape comes last
+static void ppm_set_alphabet(ppm_model *m, const int *present)
+{
+  int i;
+
+  for (m->K = 0, i = 0; i < 256; i++)
+    m->index[i] = present[i] ? m->K++ : -1;
+  m->K++;
+}
+
+/*
+Copies the model src into dst (which holds no arrays) over the alphabet of src
+and the bytes flagged in extra. The symbols of src keep their frequencies, the
+new ones have none, so every cumulative frequency is unchanged.
+*/
+static int ppm_copy_model(ppm_model *dst, const ppm_model *src, const int *extra)
+{
+  int present[256];
+  int64_t ctx;
+  int i, b, K, Ks = src->K;
+
+  for (b = 0; b < 256; b++)
+    present[b] = src->index[b] >= 0 || (extra != NULL && extra[b]);
+  memset(dst, 0, sizeof(ppm_model));
+  ppm_set_alphabet(dst, present);
+  K = dst->K;
+  if (ppm_reserve(dst, src->num > 0 ? src->num : 1) < 0)
+    return -1;
+  dst->num = src->num;
+  memcpy(dst->totals, src->totals, src->num*sizeof(uint64_t));
+  if (K == Ks)
+  {
+    memcpy(dst->counts, src->counts, src->num*K*sizeof(uint32_t));
+    memcpy(dst->children, src->children, src->num*K*sizeof(int32_t));
+    return 0;
+  }
+  memset(dst->counts, 0, src->num*K*sizeof(uint32_t));
+  memset(dst->children, 0xff, src->num*K*sizeof(int32_t));
+  for (ctx = 0; ctx < src->num; ctx++)
+  {
+    for (b = 0; b < 256; b++)
+    {
+      if ((i = src->index[b]) < 0)
+        continue;
+      dst->counts[ctx*K + dst->index[b]] = src->counts[ctx*Ks + i];
+      dst->children[ctx*K + dst->index[b]] = src->children[ctx*Ks + i];
+    }
+    dst->counts[ctx*K + K - 1] = src->counts[ctx*Ks + Ks - 1];
+  }
+  return 0;
+}
+
+// Codes symbol (an index, K - 1 for the end of data) in the highest order context that has it
+static void ppm_encode_symbol(ppm_coder *c, const ppm_model *m, const int64_t *chain, int depth, int symbol, int byte)
+{
+  int K = m->K;
+  int order, i;
+  uint64_t low;
+  const uint32_t *row;
+
+  for (order = depth; order >= 0; order--)
+  {
+    if (chain[order] < 0)
+      continue;
+    row = m->counts + chain[order]*K;
+    if (symbol != K - 1 && row[symbol] > 0)
+    {
+      for (low = 0, i = 0; i < symbol; i++)
+        low += row[i];
+      ppm_encode(c, low, low + row[symbol], m->totals[chain[order]]);
+      return;
+    }
+    // Else write context escape symbol and continue decrementing the order
+    for (low = 0, i = 0; i < K - 1; i++)
+      low += row[i];
+    ppm_encode(c, low, low + row[K - 1], m->totals[chain[order]]);
+  }
+  // order -1, a flat table over all 257 symbols
+  ppm_encode(c, byte, byte + 1, 257);
+}
+
+// chain[j], the context of the last j bytes, -1 from the first one never seen
+static void ppm_chain(ppm_stream *s)
+{
+  int j;
+  const ppm_model *m = &s->m;
+
+  s->chain[0] = 0;
+  for (j = 1; j <= s->depth; j++)
+    s->chain[j] = s->chain[j - 1] < 0 ? -1 : m->children[s->chain[j - 1]*m->K + m->index[s->history[j - 1]]];
+}
+
+static int ppm_stream_init(ppm_stream *s, int order)
+{
+  s->order = order;
+  s->depth = 0;
+  s->c.low = 0;
+  s->c.high = PPM_STATE_MASK;
+  s->c.num_underflow = 0;
+  s->c.num_bits = 0;
+  s->history = (uint8_t *)malloc(order + 1);
+  s->chain = (int64_t *)malloc((order + 1)*sizeof(int64_t));
+  if (s->history == NULL || s->chain == NULL)
+    return -1;
+  return 0;
+}
+
+static void ppm_stream_free(ppm_stream *s)
+{
+  free(s->history);
+  free(s->chain);
+  ppm_free_model(&s->m);
+}
+
+// Codes the n bytes of buf, whose bytes must all be in the alphabet of the model
+static int ppm_stream_feed(ppm_stream *s, const uint8_t *buf, int64_t n)
+{
+  ppm_model *m = &s->m;
+  int K = m->K;
+  int i;
+  int64_t t, ctx, child;
+
+  for (t = 0; t < n; t++)
+  {
+    int symbol = m->index[buf[t]];
+
+    ppm_chain(s);
+    ppm_encode_symbol(&s->c, m, s->chain, s->depth, symbol, buf[t]);
+    // count the symbol in the contexts of each suffix of the history, adding those missing
+    ctx = 0;
+    m->counts[symbol]++;
+    m->totals[0]++;
+    for (i = 0; i < s->depth; i++)
+    {
+      child = m->children[ctx*K + m->index[s->history[i]]];
+      if (child < 0)
+      {
+        child = ppm_new_context(m);
+        if (child < 0)
+          return -1;
+        m->children[ctx*K + m->index[s->history[i]]] = (int32_t)child;
+      }
+      ctx = child;
+      m->counts[ctx*K + symbol]++;
+      m->totals[ctx]++;
+    }
+    // Prepend current symbol, dropping oldest symbol if necessary
+    if (s->order >= 1)
+    {
+      if (s->depth == s->order)
+        s->depth--;
+      memmove(s->history + 1, s->history, s->depth);
+      s->history[0] = buf[t];
+      s->depth++;
+    }
+  }
+  return 0;
+}
+
+// Number of bytes written once the end of data is coded, leaving the stream as it is
+static int64_t ppm_stream_length(ppm_stream *s)
+{
+  ppm_coder c = s->c;
+
+  ppm_chain(s);
+  ppm_encode_symbol(&c, &s->m, s->chain, s->depth, s->m.K - 1, 256);
+  // the final bit of finish(); a last partial byte is never written
+  return (c.num_bits + 1)/8;
+}
+
+/*
+    INPUT:
+      *buf: bytes to compress
+      n: number of bytes
+      order: context order of the model, at least 0
+    OUTPUT:
+      number of bytes of compressed output, or -1 if memory ran out
+*/
+PPMEXPORT int64_t ppm_compressed_length(const uint8_t *buf, int64_t n, int order)
+{
+  int present[256];
+  int64_t t, result = -1;
+  ppm_stream s;
+
+  if (order < 0)
+    return -1;
+  memset(&s.m, 0, sizeof(ppm_model));
+  for (t = 0; t < 256; t++)
+    present[t] = 0;
+  for (t = 0; t < n; t++)
+    present[buf[t]] = 1;
+  ppm_set_alphabet(&s.m, present);
+  if (ppm_stream_init(&s, order) == 0 && ppm_new_context(&s.m) == 0 && ppm_stream_feed(&s, buf, n) == 0)
+    result = ppm_stream_length(&s);
+  ppm_stream_free(&s);
+  return result;
+}
+
+/*
+A stream after a prefix x, from which the length of x followed by any y is
+found by continuing a copy of it with y, without coding x again.
+    ppm_prefix_new(buf, n, order): the stream after the n bytes of buf, or NULL
+                                   if memory ran out
+    ppm_prefix_length(p): compressed length of x
+    ppm_prefix_length_with(p, buf, n): compressed length of x followed by the n
+                                       bytes of buf, or -1 if memory ran out
+    ppm_prefix_free(p): releases the stream
+*/
+PPMEXPORT void ppm_prefix_free(void *p)
+{
+  if (p != NULL)
+    ppm_stream_free((ppm_stream *)p);
+  free(p);
+}
+
+PPMEXPORT void *ppm_prefix_new(const uint8_t *buf, int64_t n, int order)
+{
+  int present[256];
+  int64_t t;
+  ppm_stream *s;
+
+  if (order < 0)
+    return NULL;
+  s = (ppm_stream *)calloc(1, sizeof(ppm_stream));
+  if (s == NULL)
+    return NULL;
+  for (t = 0; t < 256; t++)
+    present[t] = 0;
+  for (t = 0; t < n; t++)
+    present[buf[t]] = 1;
+  ppm_set_alphabet(&s->m, present);
+  if (ppm_stream_init(s, order) < 0 || ppm_new_context(&s->m) < 0 || ppm_stream_feed(s, buf, n) < 0)
+  {
+    ppm_prefix_free(s);
+    return NULL;
+  }
+  return s;
+}
+
+PPMEXPORT int64_t ppm_prefix_length(void *p)
+{
+  return ppm_stream_length((ppm_stream *)p);
+}
+
+PPMEXPORT int64_t ppm_prefix_length_with(void *p, const uint8_t *buf, int64_t n)
+{
+  int present[256];
+  int64_t t, result = -1;
+  ppm_stream *x = (ppm_stream *)p;
+  ppm_stream s;
+
+  for (t = 0; t < 256; t++)
+    present[t] = 0;
+  for (t = 0; t < n; t++)
+    present[buf[t]] = 1;
+  memset(&s.m, 0, sizeof(ppm_model));
+  if (ppm_stream_init(&s, x->order) == 0 && ppm_copy_model(&s.m, &x->m, present) == 0)
+  {
+    s.depth = x->depth;
+    memcpy(s.history, x->history, x->depth);
+    s.c = x->c;
+    if (ppm_stream_feed(&s, buf, n) == 0)
+      result = ppm_stream_length(&s);
+  }
+  ppm_stream_free(&s);
+  return result;
+}
+
+/*
+    INPUT:
+      *buf: rows*n bytes, one sequence per row
+      rows, n: shape of buf
+      order: context order of the model
+      *out: int64 array, receives the compressed length of each row
+      nthreads: number of threads to spread the rows over
+    OUTPUT:
+      0, or -1 if memory ran out for some row
+*/
+typedef struct
+{
+  const uint8_t *buf;
+  int64_t rows;
+  int64_t n;
+  int order;
+  int64_t *out;
+} ppm_batch_ctx;
+
+static void ppm_batch_task(void *p, int tid, int nthreads)
+{
+  ppm_batch_ctx *c = (ppm_batch_ctx *)p;
+  int64_t r;
+  int64_t start = c->rows*tid/nthreads;
+  int64_t stop = c->rows*(tid+1)/nthreads;
+
+  for (r = start; r < stop; r++)
+    c->out[r] = ppm_compressed_length(c->buf + r*c->n, c->n, c->order);
+}
+
+PPMEXPORT int ppm_compressed_length_batch(const uint8_t *buf, int64_t rows, int64_t n, int order, int64_t *out, int nthreads)
+{
+  ppm_batch_ctx c;
+  int64_t r;
+
+  c.buf = buf;
+  c.rows = rows;
+  c.n = n;
+  c.order = order;
+  c.out = out;
+  if (nthreads > rows)
+    nthreads = (int)rows;
+  lzc_parallel(ppm_batch_task, &c, nthreads);
+  for (r = 0; r < rows; r++)
+    if (out[r] < 0)
+      return -1;
+  return 0;
+}
+
+// Dummy definition to satisfy Microsoft compiler when using the Python extension mechanism to build.
+void PyInit_ppm(void)
+{
+
+}
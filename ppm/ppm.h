@@ -0,0 +1,15 @@
+#ifndef PPM_H_INCLUDED
+#define PPM_H_INCLUDED 1
+
+#include <stdint.h>
+
+#if defined(_MSC_VER)
+#define PPMEXPORT __declspec(dllexport)
+#else
+#define PPMEXPORT
+#endif
+
+PPMEXPORT int64_t ppm_compressed_length(const uint8_t *buf, int64_t n, int order);
+PPMEXPORT int ppm_compressed_length_batch(const uint8_t *buf, int64_t rows, int64_t n, int order, int64_t *out, int nthreads);
+
+#endif
@@ -0,0 +1,161 @@
+import ctypes, os, platform, sys
+from numpy.ctypeslib import ndpointer
+from numpy import ascontiguousarray, asarray, empty, frombuffer, ndarray
+from numpy import uint8, int64
+
+"""
+Native implementation of the compressed length of ncd/ppm_compress_mod.py. The C
+extension runs the same order-k PPM model and 32 bit arithmetic coder and counts
+the bits they would write, so the lengths are exactly those of compressed_length.
+"""
+
+pyvernum = str(sys.version_info[0]) + str(sys.version_info[1])
+libpath = os.path.abspath(__file__)
+libpath = os.path.realpath(libpath)
+libpath = os.path.dirname(libpath)
+libpath = os.path.dirname(libpath)
+
+# try to figure out the name of the library
+if platform.system() == "Darwin":
+    libpath = os.path.join(libpath, "ppm.cpython-" + pyvernum + "m-darwin.so")
+elif platform.system() == "Windows":
+    libpath = os.path.join(libpath, "ppm.cp" + pyvernum + "-win_amd64.pyd")
+else:
+    libpath = os.path.join(libpath, "ppm.cpython-" + pyvernum + "m-x86_64-linux-gnu.so")
+
+# path to DLL and argument types
+_ppm = ctypes.CDLL(libpath)
+_bytes = ndpointer(uint8, flags="C_CONTIGUOUS")
+_out = ndpointer(int64, flags="C_CONTIGUOUS")
+_ppm.ppm_compressed_length.argtypes = (_bytes, ctypes.c_int64, ctypes.c_int)
+_ppm.ppm_compressed_length.restype = ctypes.c_int64
+_ppm.ppm_compressed_length_batch.argtypes = (_bytes, ctypes.c_int64, ctypes.c_int64, ctypes.c_int, _out, ctypes.c_int)
+_ppm.ppm_compressed_length_batch.restype = ctypes.c_int
+_ppm.ppm_prefix_new.argtypes = (_bytes, ctypes.c_int64, ctypes.c_int)
+_ppm.ppm_prefix_new.restype = ctypes.c_void_p
+_ppm.ppm_prefix_length.argtypes = (ctypes.c_void_p,)
+_ppm.ppm_prefix_length.restype = ctypes.c_int64
+_ppm.ppm_prefix_length_with.argtypes = (ctypes.c_void_p, _bytes, ctypes.c_int64)
+_ppm.ppm_prefix_length_with.restype = ctypes.c_int64
+_ppm.ppm_prefix_free.argtypes = (ctypes.c_void_p,)
+_ppm.ppm_prefix_free.restype = None
+
+# longest input whose counts stay within the totals the 32 bit coder accepts
+MAX_LENGTH = 2 ** 30 - 2
+
+
+def _as_bytes(buf):
+    "uint8 view of the bytes of buf, copied only if it is not contiguous"
+    if isinstance(buf, ndarray):
+        return ascontiguousarray(buf).reshape(-1).view(uint8)
+    return frombuffer(memoryview(buf).cast("B"), dtype=uint8)
+
+
+def ppm_compressed_length(buf, order=3):
+    """
+    Calculates the length in bytes of the PPM compression of a buffer, as
+    ppm_compress_mod.compressed_length does, in the C extension.
+
+    INPUT:
+        buf : bytes-like or numpy array, required
+          the bytes to compress; an array is read as its raw bytes
+
+        order : int, optional
+          context order of the PPM model, at least 0
+
+    OUTPUT:
+        length : int, number of bytes of compressed output
+    """
+    global _ppm
+    if order < 0:
+        raise ValueError("order must be at least 0")
+    x = _as_bytes(buf)
+    if len(x) > MAX_LENGTH:
+        raise ValueError("Input too long for the 32 bit arithmetic coder")
+    length = _ppm.ppm_compressed_length(x, len(x), order)
+    if length < 0:
+        raise MemoryError("Out of memory building the PPM model")
+    return int(length)
+
+
+def ppm_compressed_length_batch(s, order=3, threads=1):
+    """
+    Calculates the PPM compressed length of every row of a 2-D array with a
+    single call into the C extension.
+
+    INPUT:
+        s : 2-D array-like, required
+          one sequence per row; each row is compressed as its raw bytes, so
+          uint8 rows are compressed as they are
+
+        order : int, optional
+          context order of the PPM model, at least 0
+
+        threads : int, optional
+          number of OS threads the rows are spread over
+
+    OUTPUT:
+        lengths : numpy int64 array, the compressed length of each row in bytes
+    """
+    global _ppm
+    if order < 0:
+        raise ValueError("order must be at least 0")
+    s = asarray(s)
+    if s.ndim != 2:
+        raise ValueError("Input must be a 2-D array")
+    rows = s.shape[0]
+    # the uint8 view of a 2-D array keeps its rows, even when there are none
+    x = ascontiguousarray(s).view(uint8)
+    n = x.shape[1]
+    if n > MAX_LENGTH:
+        raise ValueError("Input too long for the 32 bit arithmetic coder")
+    lengths = empty(rows, dtype=int64)
+    if rows > 0 and _ppm.ppm_compressed_length_batch(x, rows, n, order, lengths, max(int(threads), 1)) < 0:
+        raise MemoryError("Out of memory building the PPM model")
+    return lengths
+
+
+class PpmPrefix:
+    """
+    The PPM model and coder after a prefix x, kept in the C extension, from which
+    the compressed length of x followed by any y is found by continuing a copy of
+    them with y, so x is only modelled once.
+
+    INPUT:
+        buf : bytes-like or numpy array, required
+          the prefix x, read as ppm_compressed_length reads it
+
+        order : int, optional
+          context order of the PPM model, at least 0
+    """
+
+    def __init__(self, buf, order=3):
+        self._state = None
+        if order < 0:
+            raise ValueError("order must be at least 0")
+        x = _as_bytes(buf)
+        self.size = len(x)
+        if self.size > MAX_LENGTH:
+            raise ValueError("Input too long for the 32 bit arithmetic coder")
+        self._state = _ppm.ppm_prefix_new(x, self.size, order)
+        if not self._state:
+            raise MemoryError("Out of memory building the PPM model")
+
+    def __del__(self):
+        if self._state:
+            _ppm.ppm_prefix_free(self._state)
+            self._state = None
+
+    def length(self):
+        "Compressed length of x in bytes"
+        return int(_ppm.ppm_prefix_length(self._state))
+
+    def length_with(self, buf):
+        "Compressed length in bytes of x followed by the bytes of buf"
+        y = _as_bytes(buf)
+        if self.size + len(y) > MAX_LENGTH:
+            raise ValueError("Input too long for the 32 bit arithmetic coder")
+        length = _ppm.ppm_prefix_length_with(self._state, y, len(y))
+        if length < 0:
+            raise MemoryError("Out of memory copying the PPM model")
+        return int(length)
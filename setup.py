@@ -11,7 +11,20 @@ if platform.system() == "Darwin":
     os.environ["CCX"] = "clang"
 
 # Changed because /lzc not cross-platform compatible
-liblzc = Extension("lzc", sources=["lzc/lzc.c"])
+# the batch kernels spread rows over OS threads
+lzc_libraries = [] if platform.system() == "Windows" else ["pthread"]
+liblzc = Extension(
+    "lzc",
+    sources=["lzc/lzc.c"],
+    depends=["lzc/lzc.h", "lzc/lzc_kernels.h", "lzc/lzc_parallel.h"],
+    libraries=lzc_libraries,
+)
+libppm = Extension(
+    "ppm",
+    sources=["ppm/ppm.c"],
+    depends=["ppm/ppm.h", "lzc/lzc_parallel.h"],
+    libraries=lzc_libraries,
+)
 
 setup(
     name="complexity",
@@ -19,10 +32,10 @@ setup(
     description="Python implementation of sequence complexity measures",
     author="Kyra Kadhim, Kevin Brown",
     author_email="kadhimk@oregonstate.edu",
-    packages=["complexity", "complexity.lzc", "complexity.ncd"],
+    packages=["complexity", "complexity.lzc", "complexity.ncd", "complexity.ppm"],
     package_dir={"complexity": ""},
     ext_package="complexity",
-    ext_modules=[liblzc],
+    ext_modules=[liblzc, libppm],
     license="BSD-3",
     classifiers=[
         "License :: OSI Approved :: BSD-3 License",
@@ -0,0 +1,28 @@
+from complexity.utilities import entropyd, entropyd_batch
+import numpy as np
+
+# The jackknife estimate from the counts is that of leaving out each symbol in turn
+for trial in range(200):
+    n = np.random.randint(2, 60)
+    s = np.random.randint(0, [2, 3, 5, 20][trial % 4], n)
+    H_ML = entropyd(s, "ML")
+    left_out = sum(entropyd(np.delete(s, i), "ML") for i in range(n))
+    assert np.isclose(entropyd(s, "JK"), n * H_ML - (n - 1.0) / n * left_out, rtol=1e-9, atol=1e-12)
+assert entropyd([1], "JK") == entropyd(np.zeros(9), "JK") == 0.0
+
+# entropyd_batch agrees with entropyd row by row, through the table of counts and
+# through the fallback for large alphabets
+for s in [
+    np.random.randint(0, 2, (30, 50)),
+    np.random.randint(0, 6, (30, 7)),
+    np.random.binomial(1, 0.02, (20, 40)),
+    np.random.randint(0, 10 ** 6, (5, 9)),
+    np.zeros((4, 10), dtype=int),
+    np.zeros((3, 0), dtype=int),
+    np.zeros((0, 5), dtype=int),
+]:
+    for est in ["ML", "MM", "JK"]:
+        H = entropyd_batch(s, est)
+        assert H.shape == (len(s),)
+        assert np.allclose(H, [entropyd(row, est) for row in s], rtol=1e-12, atol=1e-12)
+print("entropy estimators agree")
@@ -0,0 +1,22 @@
+from complexity.etc import etc
+import numpy as np
+
+# The repair engine has to reproduce the original NSRPS loop: same ETC measure
+# and the same entropies up to floating point rounding
+for n in [10, 100, 1000]:
+    for x in [
+        np.random.binomial(1, 0.5, n),  # random seq
+        np.random.binomial(1, 0.05, n),  # sparse seq with long runs
+        np.tile(np.random.binomial(1, 0.5, 7), n)[:n],  # repeated seq
+        np.random.randint(0, 4, n),  # larger alphabet
+    ]:
+        for est in ["ML", "MM"]:
+            H_a, N_a = etc(x, est, engine="nsrps")
+            H_b, N_b = etc(x, est, engine="repair")
+            assert N_a == N_b
+            assert np.allclose(H_a, H_b, rtol=1e-9, atol=1e-9)
+# empty and single symbol sequences take no iterations on either engine
+for x in [[], [1], np.array([], dtype=int)]:
+    for est in ["ML", "MM", "JK"]:
+        assert etc(x, est, engine="repair") == etc(x, est, engine="nsrps") == ([0.0], 0)
+print("etc engines agree")
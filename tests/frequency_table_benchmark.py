@@ -0,0 +1,29 @@
+# Benchmark of the frequency tables behind the PPM compressor: the time to compress
+# a random binary sequence with a PpmModel built on each, and a check that both
+# give the same output
+from complexity.ncd import arithmeticcoding, ppmmodel, ppm_compress_mod
+import numpy as np
+import io, time
+
+x = ppm_compress_mod.makestream(np.random.binomial(1, 0.5, 5000)).getvalue()
+
+outputs = []
+for table in [arithmeticcoding.SimpleFrequencyTable, arithmeticcoding.FenwickFrequencyTable]:
+    start = time.time()
+    # the loop of ppm_compress_mod.compress with the table chosen here
+    output = io.BytesIO()
+    enc = arithmeticcoding.ArithmeticEncoder(32, arithmeticcoding.BitOutputStream(output))
+    model = ppmmodel.PpmModel(ppm_compress_mod.MODEL_ORDER, 257, 256, table)
+    history = []
+    for symbol in x:
+        ppm_compress_mod.encode_symbol(model, history, symbol, enc)
+        model.increment_contexts(history, symbol)
+        if len(history) == model.model_order:
+            history.pop()
+        history.insert(0, symbol)
+    ppm_compress_mod.encode_symbol(model, history, 256, enc)
+    enc.finish()
+    outputs.append(output.getvalue())
+    print(table.__name__, "{:.3f} s".format(time.time() - start))
+
+assert outputs[0] == outputs[1]
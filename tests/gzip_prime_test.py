@@ -0,0 +1,20 @@
+from complexity.ncd.compressors import get_compressor, _FromScratch
+import numpy as np
+import gzip
+
+# A deflate stream primed with x and continued with y gives the lengths of
+# compressing x and x + y from scratch, for gzip and gzip_padded
+sizes = [0, 1, 2, 100, 5000]
+for name in ["gzip", "gzip_padded"]:
+    compressor = get_compressor(name)
+    for trial in range(60):
+        x = np.random.randint(0, [2, 4, 256][trial % 3], sizes[trial % 5]).astype(np.uint8)
+        y = np.random.randint(0, [2, 4, 256][trial % 3], sizes[trial // 5 % 5]).astype(np.uint8)
+        px, py = compressor.encode(x), compressor.encode(y)
+        primed = compressor.start(px)
+        scratch = _FromScratch(compressor, px)
+        assert primed.length() == scratch.length() == len(gzip.compress(px))
+        assert primed.length_with(py) == scratch.length_with(py) == len(gzip.compress(compressor.concat(px, py)))
+        # the state is not changed by measuring a continuation
+        assert primed.length() == len(gzip.compress(px))
+print("primed gzip agrees")
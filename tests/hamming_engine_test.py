@@ -0,0 +1,22 @@
+from complexity.hamming import hamming, _hamming_fft
+import numpy as np
+
+# The FFT engine gives the minimum circular hamming distances of the loop engine,
+# whether a tile holds many rows or a row is longer than a tile, and with workers
+if __name__ == "__main__":
+    for s in [
+        np.random.binomial(1, 0.5, (7, 40)),  # binary
+        np.random.binomial(1, 0.1, (6, 33)),  # sparse binary
+        np.random.randint(0, 4, (7, 40)),  # several symbols
+        np.random.randint(-2, 3, (5, 31)) * 7,  # several symbols, not 0..k
+        np.tile(np.random.randint(0, 3, 6), (6, 6)),  # equal rows
+        np.ones((4, 20), dtype=int),  # one symbol
+    ]:
+        expected = hamming(s, engine="loop")
+        assert np.array_equal(hamming(s), expected)
+        n = s.shape[1]
+        # tiles of a single row longer than the tile, of two rows and of all rows
+        for tile_size in [n // 3, 2 * n, 2 ** 18]:
+            assert np.array_equal(_hamming_fft(s, tile_size=tile_size), expected)
+            assert np.array_equal(_hamming_fft(s, workers=3, tile_size=tile_size), expected)
+    print("hamming engines agree")
@@ -0,0 +1,43 @@
+from complexity.lzc import lzc
+import numpy as np
+
+# The batch and pair kernels give the lzc of every row and of every concatenation
+# of two rows, as lz_complexity does one sequence at a time, for every element
+# type and layout they accept
+for trial in range(30):
+    rows, n = np.random.randint(1, 12), np.random.randint(2, 80)
+    base = np.random.randint(0, [2, 3, 100][trial % 3], (rows, n))
+    if trial % 5 == 0:
+        base[:] = base[0]  # equal rows
+    for s in [
+        base.astype(bool) if trial % 3 == 0 else base % 2 == 1,
+        base.astype(np.int8),
+        base.astype(np.uint8),
+        base.astype(np.int32),
+        base.astype(np.int64) - 50,
+        np.asfortranarray(base),
+        base.tolist(),
+    ]:
+        x = np.asarray(s).astype(np.int64)
+        expected = [lzc.lz_complexity(row) for row in x]
+        pairs = np.zeros((rows, rows), dtype=np.int64)
+        for j in range(rows):
+            for i in range(j + 1):
+                pairs[i, j] = lzc.lz_complexity(np.concatenate((x[j], x[i])))
+        for threads in [1, 3]:
+            assert np.array_equal(lzc.lz_complexity_batch(s, threads=threads), expected)
+            assert np.array_equal(lzc.lz_complexity_pairs(s, threads=threads), pairs)
+
+# rows of one element still make pairs, and an empty batch is empty
+one = [[0], [1], [1]]
+for i, j in [(0, 0), (0, 1), (1, 2), (2, 2)]:
+    assert lzc.lz_complexity_pairs(one)[i, j] == lzc.lz_complexity(one[j] + one[i])
+assert lzc.lz_complexity_batch(np.zeros((0, 5), dtype=np.uint8)).shape == (0,)
+assert lzc.lz_complexity_pairs(np.zeros((0, 5), dtype=np.uint8)).shape == (0, 0)
+for f in [lambda: lzc.lz_complexity_batch([[0], [1]]), lambda: lzc.lz_complexity_batch([0, 1, 1])]:
+    try:
+        f()
+        assert False
+    except ValueError:
+        pass
+print("batch lzc agrees")
@@ -0,0 +1,30 @@
+from complexity.lzc import lzc
+import numpy as np
+
+# Extending a parse chunk by chunk, or a fork of it, gives the lzc and phrases
+# of parsing the whole concatenation at once
+for trial in range(100):
+    chunks = [np.random.binomial(1, 0.3, np.random.randint(1, 60)) for i in range(np.random.randint(1, 6))]
+    dtype = [np.uint8, np.int32, np.int64][trial % 3]
+    chunks = [c.astype(dtype) for c in chunks]
+    whole = np.concatenate(chunks)
+    parser = lzc.LZParser(chunks[0])
+    for c in chunks[1:]:
+        parser.extend(c)
+    if len(whole) >= 2:
+        assert parser.complexity() == lzc.lz_complexity(whole)
+        assert parser.phrases()[0] == 0 and len(parser.phrases()) == parser.complexity()
+
+    # forks share the prefix and do not see each other's extensions
+    y = np.random.binomial(1, 0.3, 40)
+    z = np.random.randint(0, 3, 25)
+    a = parser.fork().extend(y)
+    b = parser.fork().extend(z)
+    assert a.complexity() == lzc.lz_complexity(np.concatenate((whole, y)))
+    assert b.complexity() == lzc.lz_complexity(np.concatenate((whole, z)))
+
+    # an extension of another dtype is converted to that of the parse
+    other = [np.int64, np.uint8, np.int32][trial % 3]
+    c = parser.fork().extend(z.astype(other)).extend(y.astype(bool))
+    assert c.complexity() == lzc.lz_complexity(np.concatenate((whole, z, y)).astype(np.int64))
+print("resumed lzc agrees")
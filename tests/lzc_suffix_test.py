@@ -0,0 +1,40 @@
+from complexity.lzc import lzc
+from complexity import lz_complexity_python
+import numpy as np
+
+# The suffix-array engine counts the phrases of the Kaspar-Schuster scan, for
+# every kernel element type and in the pure Python version
+for trial in range(200):
+    n = np.random.randint(2, 300)
+    x = [
+        np.random.binomial(1, 0.5, n),  # random seq
+        np.random.binomial(1, 0.05, n),  # sparse seq with long runs
+        np.zeros(n, dtype=int),  # constant seq
+        np.arange(n) % 2,  # alternating seq
+        np.tile(np.random.randint(0, 4, 5), n)[:n],  # repeated seq
+        np.random.randint(0, 200, n),  # large alphabet
+    ][trial % 6]
+    expected = lz_complexity_python.lz_complexity(list(x), engine="ks")
+    for dtype in [np.uint8, np.int32, np.int64]:
+        assert lzc.lz_complexity(x.astype(dtype), engine="suffix") == expected, (x, dtype)
+        assert lzc.lz_complexity(x.astype(dtype)) == expected, (x, dtype)
+    assert lz_complexity_python.lz_complexity(list(x), engine="suffix") == expected, x
+
+# values beyond the uint8 range use the wider kernels
+x = np.random.randint(-(2 ** 40), 2 ** 40, 100)
+assert lzc.lz_complexity(x, engine="suffix") == lz_complexity_python.lz_complexity(list(x))
+
+# a phrase needs at least 2 elements
+for x in [[], [1]]:
+    for dtype in [np.uint8, np.int32, np.int64]:
+        try:
+            lzc.lz_complexity(np.array(x, dtype=dtype), engine="suffix")
+            raise AssertionError("no error for " + str(x))
+        except ValueError:
+            pass
+    try:
+        lz_complexity_python.lz_complexity(x, engine="suffix")
+        raise AssertionError("no error for " + str(x))
+    except ValueError:
+        pass
+print("suffix lzc agrees")
@@ -0,0 +1,27 @@
+from complexity.lzc import lzc
+from complexity import lz_complexity_python
+import numpy as np
+
+# Every window of the suffix-array sweep has the lzc of its slice. Only whole
+# windows are returned, so a trailing partial window is left out, and with
+# step > window the elements between windows are skipped
+for n in [2, 7, 50, 333]:
+    for x in [
+        np.random.binomial(1, 0.5, n),  # random seq
+        np.zeros(n, dtype=int),  # constant seq
+        np.arange(n) % 2,  # alternating seq
+        np.random.randint(0, 5, n),  # larger alphabet
+    ]:
+        for window in [2, 3, 10, 40]:
+            for step in [1, 3, window, window + 7]:
+                starts = range(0, n - window + 1, step)
+                expected = [lzc.lz_complexity(x[t : t + window]) for t in starts]
+                for dtype in [np.uint8, np.int32, np.int64]:
+                    got = lzc.lz_complexity_windowed(x.astype(dtype), window, step)
+                    assert list(got) == expected, (n, window, step, dtype)
+                got = lz_complexity_python.lz_complexity_windowed(list(x), window, step)
+                assert list(got) == expected, (n, window, step)
+                if n >= window and (n - window) % step:
+                    # the last window ends before the sequence does
+                    assert starts[-1] + window < n
+print("windowed lzc agrees")
@@ -0,0 +1,55 @@
+from complexity.ncd import NCD
+from complexity.ncd.encoding import encode
+import numpy as np
+import os, tempfile
+
+# The 'lz' distances compress one concatenation whatever the encoding, so on 0/1
+# data, where 'uint8' gives the same symbols as 'raw', they agree
+X = np.random.binomial(1, 0.5, (9, 400))
+raw = NCD.NCD(X, "lz")
+assert np.array_equal(NCD.NCD(X, "lz", encoding="uint8"), raw)
+assert np.array_equal(NCD.NCD(X, "lz", encoding="ascii"), raw)
+path = os.path.join(tempfile.mkdtemp(), "ncd.npy")
+out = NCD.NCD_to_file(X, "lz", path, tile_size=4, encoding="uint8")
+assert np.array_equal(out, raw[np.triu_indices(len(X), k=1)])
+
+# nlz needs the symbols themselves, and refuses the encodings that do not keep them
+x, y = np.random.binomial(1, 0.5, (2, 500))
+for encoding in ["raw", "uint8", "packbits", "ascii"]:
+    try:
+        d = NCD.NCD_pairwise(x, y, "nlz", encoding=encoding)
+        assert encoding in ["raw", "uint8"] and np.isfinite(d) and -0.1 < d < 1.1
+    except ValueError:
+        assert encoding in ["packbits", "ascii"]
+
+# Each encoding gives back the symbols and has the expected length
+for n in [0, 1, 7, 8, 9, 100]:
+    s = np.random.randint(0, 2, n)
+    x = encode(s, "raw")
+    assert x.dtype == s.dtype and np.array_equal(x, s)
+    x = encode(s, "uint8")
+    assert x.dtype == np.uint8 and np.array_equal(x, s)
+    x = encode(s, "packbits")
+    assert x.dtype == np.uint8 and len(x) == (n + 7) // 8
+    assert np.array_equal(np.unpackbits(x)[:n], s) and not np.unpackbits(x)[n:].any()
+    x = encode(s, "ascii")
+    assert x == "".join(map(str, s)).encode("ascii") and len(x) == n
+    assert np.array_equal(np.frombuffer(x, dtype=np.uint8) - ord("0"), s)
+    s = np.random.randint(0, 256, n)
+    assert np.array_equal(encode(s, "uint8"), s)
+    x = encode(list(s), "ascii")
+    assert x == "".join(map(str, s)).encode("ascii")
+
+# symbols that are not single digits fall back to joining their decimal strings
+assert encode(np.array([10, 2, 255]), "ascii") == b"102255"
+assert encode(np.array([-1, 3]), "ascii") == b"-13"
+assert encode(np.array([0.5, 1.0]), "ascii") == b"0.51.0"
+assert encode(["a", "b"], "ascii") == b"ab"
+
+for s, encoding in [([256], "uint8"), ([-1], "uint8"), ([2], "packbits"), ([0, 1], "utf8")]:
+    try:
+        encode(np.array(s), encoding)
+        assert False
+    except ValueError:
+        pass
+print("ncd encodings agree")
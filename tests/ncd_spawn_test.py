@@ -0,0 +1,23 @@
+from complexity.ncd import NCD
+from complexity.ncd.compressors import register_compressor
+import multiprocessing as mp
+import numpy as np
+import os, tempfile, zlib
+
+
+def zlib_length(x):
+    return len(zlib.compress(x))
+
+
+# Worker processes started with spawn do not inherit a compressor registered at
+# run time, so the pools have to be handed the compressor itself
+if __name__ == "__main__":
+    mp.set_start_method("spawn")
+    register_compressor("zlib_spawn", None, zlib_length)
+    X = np.random.binomial(1, 0.5, (11, 300))
+    expected = NCD.NCD(X, "zlib_spawn")
+    assert np.array_equal(NCD.NCD(X, "zlib_spawn", workers=3), expected)
+    path = os.path.join(tempfile.mkdtemp(), "ncd.npy")
+    out = NCD.NCD_to_file(X, "zlib_spawn", path, tile_size=4, workers=3)
+    assert np.array_equal(out, expected[np.triu_indices(len(X), k=1)])
+    print("spawned NCD workers agree")
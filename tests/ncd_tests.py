@@ -1,5 +1,6 @@
 # Testing functions in the ncd subpackage
 from complexity.ncd.NCD import *
+import gzip, bz2, snappy
 import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import numpy as np
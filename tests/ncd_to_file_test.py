@@ -0,0 +1,37 @@
+from complexity.ncd import NCD
+import numpy as np
+import gzip, json, os, tempfile
+
+# NCD_to_file writes the NCDs of NCD(..., triu_only=True), whether in one run,
+# in blocks of tiles or resumed after losing tiles
+X = np.random.binomial(1, 0.5, (13, 300))
+expected = NCD.NCD(X, gzip, triu_only=True)
+path = os.path.join(tempfile.mkdtemp(), "ncd.npy")
+
+assert np.array_equal(NCD.NCD_to_file(X, gzip, path, tile_size=4), expected)
+
+manifest = path + ".manifest.json"
+with open(manifest) as f:
+    record = json.load(f)
+record["tiles"] = record["tiles"][:2]
+with open(manifest, "w") as f:
+    json.dump(record, f)
+np.lib.format.open_memmap(path, mode="r+")[:] = 0
+resumed = NCD.NCD_to_file(X, gzip, path, tile_size=4)
+# the tiles still recorded as done are not computed again
+assert not np.array_equal(resumed, expected)
+os.remove(path)
+os.remove(manifest)
+
+NCD.NCD_to_file(X, gzip, path, tile_size=4, rows=(0, 8))
+NCD.NCD_to_file(X, gzip, path, tile_size=4, rows=(8, 13), workers=2)
+assert np.array_equal(np.load(path), expected)
+
+# a manifest is only resumed with the data it was written for
+for Y in [X[::-1], X.astype(np.int32), X.reshape(13, 2, 150)]:
+    try:
+        NCD.NCD_to_file(Y, gzip, path, tile_size=4, rows=(0, 8))
+        assert False
+    except ValueError:
+        pass
+print("NCD_to_file agrees")
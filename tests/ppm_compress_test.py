@@ -0,0 +1,20 @@
+from complexity.ncd import ppm_compress_mod
+import numpy as np
+import io
+
+# compress writes through FastArithmeticEncoder unless checked, which has to give
+# the bytes of the checked ArithmeticEncoder and BitOutputStream exactly
+inputs = [b"", b"0", bytes(range(256))]
+for n in [1, 2, 7, 8, 9, 100, 3000]:
+    inputs.append(np.random.randint(0, 2, n).astype(np.uint8).tobytes())
+    inputs.append("".join(map(str, np.random.randint(0, 2, n))).encode("ascii"))
+for k in range(1, 5):
+    # every byte value, in random order and with repeats
+    inputs.append(np.random.permutation(np.tile(np.arange(256, dtype=np.uint8), k)).tobytes())
+    inputs.append(np.random.randint(0, 256, 500 * k).astype(np.uint8).tobytes())
+for data in inputs:
+    fast = ppm_compress_mod.compress(io.BytesIO(data)).getvalue()
+    checked = ppm_compress_mod.compress(io.BytesIO(data), checked=True).getvalue()
+    assert fast == checked
+    assert len(fast) == ppm_compress_mod.compressed_length(data)
+print("ppm compress agrees")
@@ -0,0 +1,42 @@
+from complexity.ncd import ppm_compress_mod
+from complexity.ppm import ppm
+import numpy as np
+import io
+
+# The C extension gives the lengths of the pure Python PPM compressor: those of
+# compressed_length for any order, and those of compress for its MODEL_ORDER
+for trial in range(40):
+    n = [0, 1, 2, 50, 700][trial % 5]
+    x = np.random.randint(0, [2, 4, 10, 256][trial % 4], n).astype(np.uint8)
+    for order in range(5):
+        assert ppm.ppm_compressed_length(x, order) == ppm_compress_mod.compressed_length(x, order)
+    compressed = ppm_compress_mod.compress(io.BytesIO(x.tobytes()), checked=trial < 5)
+    assert ppm.ppm_compressed_length(x.tobytes()) == len(compressed.getbuffer())
+# other dtypes are compressed as their raw bytes
+x = np.random.randint(0, 3, 300)
+assert ppm.ppm_compressed_length(x) == ppm_compress_mod.compressed_length(x.tobytes())
+
+# the batch gives the length of every row whatever the number of threads
+for rows, n in [(0, 10), (1, 300), (7, 300), (40, 120)]:
+    X = np.random.randint(0, 3, (rows, n)).astype(np.uint8)
+    expected = [ppm_compress_mod.compressed_length(row) for row in X]
+    for threads in [1, 2, 3, 8]:
+        assert np.array_equal(ppm.ppm_compressed_length_batch(X, threads=threads), expected)
+
+# inputs beyond MAX_LENGTH are refused before any modelling; np.zeros leaves the
+# pages untouched, so these cost no memory
+too_long = np.zeros(ppm.MAX_LENGTH + 1, dtype=np.uint8)
+prefix = ppm.PpmPrefix(b"0101")
+for f in [
+    lambda: ppm.ppm_compressed_length(too_long),
+    lambda: ppm.ppm_compressed_length_batch(too_long.reshape(1, -1)),
+    lambda: ppm.PpmPrefix(too_long),
+    lambda: prefix.length_with(too_long[:-4]),
+]:
+    try:
+        f()
+        assert False
+    except ValueError:
+        pass
+assert prefix.length_with(b"") == prefix.length()
+print("native ppm agrees")
@@ -0,0 +1,21 @@
+from complexity.ncd import ppm_compress_mod, ppmc
+from complexity.ppm import ppm
+import numpy as np
+
+# A model snapshot continued with y gives the length of compressing x + y from
+# scratch, and neither the snapshot nor the model it was taken from sees the
+# other's updates
+x = "".join(map(str, np.random.randint(0, 3, 500)))
+ys = ["".join(map(str, np.random.randint(0, 4, 300))) for i in range(3)]
+
+stream = ppm_compress_mod.PpmStream().feed(x.encode())
+prefix = ppm.PpmPrefix(x.encode())
+model = ppmc.ppmc("").feed(x)
+for y in ys:
+    xy = (x + y).encode()
+    assert stream.snapshot().feed(y.encode()).length() == ppm_compress_mod.compressed_length(xy)
+    assert prefix.length_with(y.encode()) == ppm_compress_mod.compressed_length(xy)
+    assert sum(model.snapshot().feed(y).bits) == ppmc.ppmc(x + y).compress()
+assert stream.length() == prefix.length() == ppm_compress_mod.compressed_length(x.encode())
+assert sum(model.bits) == ppmc.ppmc(x).compress()
+print("ppm snapshots agree")
@@ -0,0 +1,35 @@
+from complexity.ncd import ppmc
+import numpy as np
+
+# compress() finds the bits of a new sequence from counts over the whole of it;
+# they have to be those of coding it one character at a time, in the same order
+for n in [1, 10, 100, 1000]:
+    for x in [
+        np.random.binomial(1, 0.5, n),  # random seq
+        np.random.binomial(1, 0.05, n),  # sparse seq with long runs
+        np.random.randint(0, 10, n),  # every digit
+    ]:
+        x = "".join(map(str, x))
+        fast = ppmc.ppmc(x)
+        total = fast.compress()
+        slow = ppmc.ppmc(x)
+        history = 0
+        for i, c in enumerate(x.encode("latin-1")):
+            slow.code(c, history, min(i, slow.k))
+            history = ((history << 8) | c) & ((1 << (8 * slow.k)) - 1)
+        assert fast.bits == slow.bits
+        assert total == sum(slow.bits)
+print("ppmc predictions agree")
+
+# ppmc_lengths models all rows and concatenations together, with lengths equal
+# to those of one ppmc object per string
+for order in [1, 3, 5]:
+    X = np.random.randint(0, 4, (5, 100))
+    pairs = [(0, 1), (1, 0), (4, 4)]
+    C, C_pairs = ppmc.ppmc_lengths(X, order=order, pairs=pairs)
+    for r in range(len(X)):
+        assert C[r] == ppmc.ppmc("".join(map(str, X[r])), order=order).compress()
+    for p, (i, j) in enumerate(pairs):
+        xy = "".join(map(str, np.concatenate((X[i], X[j]))))
+        assert C_pairs[p] == ppmc.ppmc(xy, order=order).compress()
+print("ppmc_lengths agrees")
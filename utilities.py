@@ -1,5 +1,5 @@
-from numpy import log, vectorize, delete, array
-from collections import defaultdict
+from numpy import log, array, asarray, ndarray, dtype, zeros, unique, bincount, arange, where, int64
+from multiprocessing import shared_memory
 
 
 def safe_xlogx(s, cutoff=1.0e-08):
@@ -33,31 +33,131 @@ def entropyd(x, est="ML"):
 
                 'ML' : maximum-likelihood (plugin)
                 'MM' : Miller-Maddow corrected
-                'JK' : Jackknife estimator (can be slow)
+                'JK' : Jackknife estimator, leave-one-out computed from the counts
 
     OUTPUT:
         H[x]: entropy of x, measured in nats
     """
-    vec_xlogx = vectorize(safe_xlogx)
-    # do the frequency counting
-    counts = defaultdict(int)
-    for xi in x:
-        counts[xi] += 1
-    # convert to frequencies
-    sumpofx = 1.0 * sum(list(counts.values()))
-    pofx = array(list(counts.values())) / sumpofx
-    # ML estimator
-    H_ML = -1 * vec_xlogx(pofx).sum()
+    if isinstance(x, str):
+        x = list(x)
+    x = asarray(x).ravel()
+    counts = _symbol_counts(x)
+    return _entropy_from_counts(counts[None, :], len(x), est)[0]
+
+
+def entropyd_batch(x, est="ML"):
+    """
+    Computes the entropy of every row of a 2-D array of discrete (integer) data,
+    as entropyd does for a single sequence.
+
+    INPUT:
+        x: 2-D array, required
+            one sequence per row
+
+        est: string, optional
+            estimator, as in entropyd
+
+    OUTPUT:
+        H: array of the entropy of each row, measured in nats
+    """
+    x = asarray(x)
+    if x.ndim != 2:
+        raise ValueError("x must be a 2-D array")
+    rows, n = x.shape
+    if x.size == 0:
+        return zeros(rows)
+    _, codes = unique(x, return_inverse=True)
+    codes = codes.reshape(rows, n)
+    K = codes.max() + 1
+    if rows * K > 4 * x.size:
+        # large alphabet, a rows x K table would be mostly empty
+        return array([entropyd(xi, est) for xi in x])
+    flat = (arange(rows)[:, None] * K + codes).ravel()
+    counts = bincount(flat, minlength=rows * K).reshape(rows, K)
+    return _entropy_from_counts(counts, n, est)
+
+
+def _symbol_counts(x):
+    "Nonzero symbol counts of a 1-D array"
+    if x.size > 0 and (x.dtype.kind in "bi" or (x.dtype.kind == "u" and x.dtype.itemsize < 8)):
+        x = x.astype(int64)
+        lo = x.min()
+        if x.max() - lo < 4 * x.size + 256:
+            counts = bincount(x - lo)
+            return counts[counts > 0]
+    return unique(x, return_counts=True)[1]
+
+
+def _masked_xlogx(x, mask):
+    return where(mask, x * log(where(mask, x, 1.0)), 0.0)
+
+
+def _entropy_from_counts(counts, n, est, cutoff=1.0e-08):
+    """
+    Entropies of the rows of a table of symbol counts, each row summing to n.
+    Probabilities below cutoff contribute nothing, as in safe_xlogx.
+    """
+    counts = asarray(counts, dtype=float)
+    if n == 0:
+        return zeros(counts.shape[0])
+    pofx = counts / (1.0 * n)
+    H_ML = -1 * _masked_xlogx(pofx, pofx >= cutoff).sum(axis=1)
+    K = (counts > 0).sum(axis=1)
     if est == "ML":
-        H = H_ML
+        return H_ML
     elif est == "MM":
-        # nonzero bins have already been removed from pofx
-        H = H_ML + (len(pofx) - 1.0) / (2.0 * len(x))
+        # only nonzero bins count towards the correction
+        return H_ML + (K - 1.0) / (2.0 * n)
     elif est == "JK":
-        Sc = 0
-        for i in range(0, len(x)):
-            newx = delete(x, i)
-            Sc += entropy(newx, bins, "ML")
-        H_JK = len(x) * H_ML - ((len(x) - 1.0) / len(x)) * Sc
-        H = H_JK
-    return H
+        if n == 1:
+            return H_ML
+        # leaving out one of the c symbols j changes sum(c log c) by
+        # d_j = c_j log c_j - (c_j - 1) log(c_j - 1), so the n leave-one-out
+        # ML entropies add up to n log(n - 1) - (n S - sum_j c_j d_j) / (n - 1)
+        S = _masked_xlogx(counts, counts > 0).sum(axis=1)
+        d = _masked_xlogx(counts, counts > 0) - _masked_xlogx(counts - 1, counts > 1)
+        Sc = n * log(n - 1.0) - (n * S - (counts * d).sum(axis=1)) / (n - 1.0)
+        H_JK = n * H_ML - ((n - 1.0) / n) * Sc
+        # a single symbol has no entropy, without rounding error
+        return where(K > 1, H_JK, H_ML)
+    raise ValueError("Unknown entropy estimator: " + str(est))
+
+
+def share_array(x):
+    """
+    Copies an array into a new block of shared memory, so that worker processes
+    can read it without it being pickled.
+
+    INPUT:
+        x: array, required
+            array to share
+
+    OUTPUT:
+        shm: SharedMemory
+            the block holding the copy; the caller must close() and unlink() it
+        spec: tuple
+            (name, shape, dtype) to pass to attach_array in the workers
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(x.nbytes, 1))
+    view = ndarray(x.shape, dtype=x.dtype, buffer=shm.buf)
+    view[...] = x
+    return shm, (shm.name, x.shape, x.dtype.str)
+
+
+def attach_array(spec):
+    """
+    Attaches to an array shared by share_array.
+
+    INPUT:
+        spec: tuple, required
+            (name, shape, dtype) as returned by share_array
+
+    OUTPUT:
+        shm: SharedMemory
+            the attached block; keep a reference to it for as long as x is used
+        x: array
+            view of the shared array
+    """
+    name, shape, dt = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, ndarray(shape, dtype=dtype(dt), buffer=shm.buf)